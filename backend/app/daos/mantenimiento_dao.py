@@ -1,19 +1,30 @@
 # DAO LIMPIO - Solo acceso a datos MongoDB
 # Responsabilidades: consultas MongoDB puras, sin lógica de negocio
 
+from pymongo.errors import BulkWriteError
 from app.database.mongodb import MongoDB
+from app.utils.metricas import Metricas
 
+@Metricas.instrumentar("mongodb")
 class MantenimientoDAO:
+    # Campo auxiliar con el código en minúsculas (indexado); no se devuelve al frontend
+    PROYECCION = {"codigo_maquina_normalizado": 0}
+
     def __init__(self):
         self.db = MongoDB.conectar()
         self.collection = self.db["mantenimientos"]
 
+    @staticmethod
+    def normalizar(codigo: str) -> str:
+        return str(codigo).strip().lower()
+
     # Inserta un mantenimiento con datos primitivos
     def insertar(self, codigo_maquina: str, empresa: str, tecnico: str, 
                  tipo: str, fecha: str, observaciones: str, usuario: str = None) -> bool:
         try:
             documento = {
                 "codigo_maquina": codigo_maquina,
+                "codigo_maquina_normalizado": self.normalizar(codigo_maquina),
                 "empresa": empresa,
                 "tecnico": tecnico,
                 "tipo": tipo,
@@ -26,10 +37,27 @@ class MantenimientoDAO:
         except Exception:
             return False
 
-    # Elimina mantenimientos por código de máquina exacto
+    # Inserta varios mantenimientos con insert_many sin orden (un fallo no detiene el resto del bloque)
+    # Devuelve los índices (dentro de la lista recibida) de los documentos que no se pudieron guardar
+    def insertar_lote(self, documentos: list, tamano_bloque: int = 1000) -> list:
+        fallidos = []
+        for inicio in range(0, len(documentos), tamano_bloque):
+            bloque = [
+                dict(documento, codigo_maquina_normalizado=self.normalizar(documento["codigo_maquina"]))
+                for documento in documentos[inicio:inicio + tamano_bloque]
+            ]
+            try:
+                self.collection.insert_many(bloque, ordered=False)
+            except BulkWriteError as e:
+                fallidos.extend(inicio + error["index"] for error in e.details.get("writeErrors", []))
+            except Exception:
+                fallidos.extend(range(inicio, inicio + len(bloque)))
+        return fallidos
+
+    # Elimina mantenimientos por código de máquina (case-insensitive, usa el índice)
     def eliminar_por_maquina(self, codigo_maquina: str) -> int:
         try:
-            resultado = self.collection.delete_many({"codigo_maquina": codigo_maquina})
+            resultado = self.collection.delete_many({"codigo_maquina_normalizado": self.normalizar(codigo_maquina)})
             return resultado.deleted_count
         except Exception:
             return 0
@@ -37,8 +65,8 @@ class MantenimientoDAO:
     # Obtiene mantenimientos por código de máquina (sin ordenar)
     def listar_por_maquina(self, codigo: str) -> list:
         try:
-            query = {"codigo_maquina": codigo}
-            cursor = self.collection.find(query)
+            query = {"codigo_maquina_normalizado": self.normalizar(codigo)}
+            cursor = self.collection.find(query, self.PROYECCION)
             return list(cursor)
         except Exception:
             return []
@@ -46,16 +74,16 @@ class MantenimientoDAO:
     # Obtiene todos los mantenimientos (sin ordenar)
     def listar_todos(self) -> list:
         try:
-            cursor = self.collection.find()
+            cursor = self.collection.find({}, self.PROYECCION)
             return list(cursor)
         except Exception:
             return []
 
-    # Obtiene mantenimientos ordenados por fecha
+    # Obtiene mantenimientos ordenados por fecha (índice codigo_maquina_normalizado + fecha)
     def listar_por_maquina_ordenados(self, codigo: str, orden: int = -1) -> list:
         try:
-            query = {"codigo_maquina": codigo}
-            cursor = self.collection.find(query).sort("fecha", orden)
+            query = {"codigo_maquina_normalizado": self.normalizar(codigo)}
+            cursor = self.collection.find(query, self.PROYECCION).sort("fecha", orden)
             return list(cursor)
         except Exception:
             return []
@@ -63,7 +91,41 @@ class MantenimientoDAO:
     # Busca mantenimientos por filtros múltiples
     def buscar_con_filtros(self, filtros: dict) -> list:
         try:
-            cursor = self.collection.find(filtros)
+            cursor = self.collection.find(filtros, self.PROYECCION)
             return list(cursor)
         except Exception:
             return []
+
+    # Resume los mantenimientos por máquina (código normalizado) con un pipeline de agregación
+    # Devuelve {codigo_normalizado: {"total": n, "ultimo": fecha_mas_reciente}}
+    # Si se indican códigos, solo se agrupan los de esas máquinas
+    # Los errores se propagan: un resumen vacío informaría máquinas sin mantenimientos
+    def resumen_por_maquinas(self, codigos_normalizados: list = None) -> dict:
+        pipeline = self._pipeline_por_maquinas(codigos_normalizados)
+        pipeline.append({"$group": {
+            "_id": "$codigo_maquina_normalizado",
+            "total": {"$sum": 1},
+            "ultimo": {"$max": "$fecha"}
+        }})
+        return {
+            grupo["_id"]: {"total": grupo["total"], "ultimo": grupo["ultimo"]}
+            for grupo in self.collection.aggregate(pipeline)
+        }
+
+    # Obtiene los mantenimientos de varias máquinas agrupados por código normalizado (más reciente primero)
+    # El orden {código, fecha} es el del índice idx_mant_codigo_fecha: se recorre el índice en lugar de ordenar
+    # en memoria (límite de 100 MB); allowDiskUse cubre el caso de que el índice todavía no exista
+    # Los errores se propagan: listas vacías no se distinguirían de máquinas sin mantenimientos
+    def listar_por_maquinas(self, codigos_normalizados: list = None) -> dict:
+        pipeline = self._pipeline_por_maquinas(codigos_normalizados)
+        pipeline.append({"$sort": {"codigo_maquina_normalizado": 1, "fecha": -1}})
+        agrupados = {}
+        for mant in self.collection.aggregate(pipeline, allowDiskUse=True):
+            agrupados.setdefault(mant.pop("codigo_maquina_normalizado"), []).append(mant)
+        return agrupados
+
+    # Etapa común: filtra por las máquinas pedidas usando el índice de código normalizado
+    def _pipeline_por_maquinas(self, codigos_normalizados: list = None) -> list:
+        if codigos_normalizados is None:
+            return []
+        return [{"$match": {"codigo_maquina_normalizado": {"$in": list(codigos_normalizados)}}}]
@@ -0,0 +1,216 @@
+# DAO - Acceso a la caché Redis de máquinas
+# Responsabilidades: mantener el índice de máquinas en Redis, sin lógica de negocio
+# Los errores de Redis se propagan para que el service decida cómo degradar
+
+import time
+import uuid
+from app.database.redis_client import redis_client, LoteRedis
+from app.daos.version_dao import VersionDAO
+from app.utils.serializacion import Serializador
+from app.utils.metricas import Metricas
+
+@Metricas.instrumentar("redis")
+class MaquinaCacheDAO:
+    # Hash código normalizado -> JSON de la máquina
+    INDICE = "siglab:maquinas:indice"
+    # Marca de índice completo con el instante de la última reconstrucción desde MySQL
+    COMPLETO = "siglab:maquinas:indice:completo"
+    # Bloqueo distribuido para que un solo backend reconstruya el índice
+    BLOQUEO = "siglab:maquinas:indice:bloqueo"
+    # Canal pub/sub para invalidar las cachés L1 de todos los backends
+    CANAL_INVALIDACIONES = "siglab:maquinas:invalidaciones"
+    # TTL suave: pasado este tiempo el índice se sirve pero se reconstruye (stale-while-revalidate)
+    TTL_SUAVE = 60
+    # TTL duro: pasado este tiempo el índice ya no se sirve y hay que ir a MySQL
+    TTL_DURO = 300
+    # Duración del bloqueo de reconstrucción (si el backend muere, se libera solo)
+    BLOQUEO_TTL_MS = 5000
+    # Filas por comando al reconstruir el índice
+    LOTE = 1000
+    # Segundos de vida del hash temporal de una reconstrucción (si el backend muere a mitad, se borra solo)
+    RECONSTRUCCION_TTL = 60
+    # Versión del listado de máquinas: cada escritura la incrementa en el mismo lote que el índice
+    VERSION = VersionDAO.PREFIJO + VersionDAO.MAQUINAS
+    # Set de códigos escritos recientemente (en el mismo lote que el índice); vence TTL_DURO después
+    # de la última escritura, así cubre cualquier recarga en curso
+    CAMBIOS = "siglab:maquinas:indice:cambios"
+
+    # Pone el hash temporal reconstruido en lugar del índice y lo marca como completo
+    #   - Sin escrituras desde la lectura de MySQL: RENAME (el volcado es exacto)
+    #   - Con escrituras de por medio: se combina; los códigos escritos recientemente conservan lo que ya
+    #     tiene el índice (sus escrituras se aplicaron una por una) y el resto toma el volcado, incluido
+    #     quitar los que ya no están en MySQL
+    # Devuelve 1 si se reemplazó y 2 si se combinó
+    _SCRIPT_REEMPLAZAR = """
+        if (redis.call('GET', KEYS[3]) or '0') == ARGV[1] then
+            if redis.call('EXISTS', KEYS[1]) == 1 then
+                redis.call('RENAME', KEYS[1], KEYS[2])
+                redis.call('PERSIST', KEYS[2])
+            else
+                redis.call('DEL', KEYS[2])
+            end
+            redis.call('SET', KEYS[4], ARGV[2], 'EX', ARGV[3])
+            return 1
+        end
+        local recientes = {}
+        for _, codigo in ipairs(redis.call('SMEMBERS', KEYS[5])) do
+            recientes[codigo] = true
+        end
+        for _, codigo in ipairs(redis.call('HKEYS', KEYS[2])) do
+            if not recientes[codigo] and redis.call('HEXISTS', KEYS[1], codigo) == 0 then
+                redis.call('HDEL', KEYS[2], codigo)
+            end
+        end
+        local volcado = redis.call('HGETALL', KEYS[1])
+        for i = 1, #volcado, 2 do
+            if not recientes[volcado[i]] then
+                redis.call('HSET', KEYS[2], volcado[i], volcado[i + 1])
+            end
+        end
+        redis.call('DEL', KEYS[1])
+        redis.call('SET', KEYS[4], ARGV[2], 'EX', ARGV[3])
+        return 2
+    """
+
+    # Libera el bloqueo solo si sigue siendo nuestro
+    _SCRIPT_LIBERAR = """
+        if redis.call('GET', KEYS[1]) == ARGV[1] then
+            return redis.call('DEL', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self):
+        self.redis = redis_client
+        self._reemplazar = self.redis.register_script(self._SCRIPT_REEMPLAZAR)
+        self._liberar = self.redis.register_script(self._SCRIPT_LIBERAR)
+
+    @staticmethod
+    def normalizar(codigo: str) -> str:
+        return str(codigo).strip().lower()
+
+    # Nuevo lote de comandos para enviar varias escrituras de una operación en un solo viaje
+    # Un lote muy grande sin transacción no bloquea a Redis para los demás clientes mientras se aplica
+    def lote(self, transaccion: bool = True) -> LoteRedis:
+        return LoteRedis(transaccion)
+
+    # Anota los códigos escritos para que una recarga en curso no los pise con su volcado
+    def _marcar_cambios(self, destino, codigos: list):
+        destino.sadd(self.CAMBIOS, *codigos)
+        destino.expire(self.CAMBIOS, self.TTL_DURO)
+
+    # Inserta o actualiza una máquina en el índice (O(1)); con "lote" solo se encola
+    def guardar(self, maquina: dict, lote: LoteRedis = None):
+        destino = lote or self.lote()
+        codigo = self.normalizar(maquina["codigo"])
+        destino.hset(self.INDICE, codigo, Serializador.texto(maquina))
+        self._marcar_cambios(destino, [codigo])
+        if lote is None:
+            destino.ejecutar()
+
+    # Inserta o actualiza varias máquinas en un solo pipeline (un viaje de red)
+    def guardar_lote(self, maquinas: list, lote: LoteRedis = None):
+        destino = lote or self.lote(transaccion=False)
+        for inicio in range(0, len(maquinas), self.LOTE):
+            bloque = {self.normalizar(m["codigo"]): Serializador.texto(m) for m in maquinas[inicio:inicio + self.LOTE]}
+            destino.hset(self.INDICE, mapping=bloque)
+            self._marcar_cambios(destino, list(bloque))
+        if lote is None:
+            destino.ejecutar()
+
+    # Elimina una máquina del índice (O(1)); con "lote" solo se encola
+    def eliminar(self, codigo: str, lote: LoteRedis = None) -> bool:
+        destino = lote or self.lote()
+        destino.hdel(self.INDICE, self.normalizar(codigo))
+        self._marcar_cambios(destino, [self.normalizar(codigo)])
+        if lote is not None:
+            return True
+        return bool(destino.ejecutar()[0])
+
+    # Verifica si un código está en el índice
+    def existe(self, codigo_normalizado: str) -> bool:
+        return bool(self.redis.hexists(self.INDICE, codigo_normalizado))
+
+    # Obtiene una máquina del índice
+    def obtener(self, codigo_normalizado: str) -> dict:
+        datos = self.redis.hget(self.INDICE, codigo_normalizado)
+        return Serializador.loads(datos) if datos else None
+
+    # Lista las máquinas del índice y su antigüedad en segundos
+    # Devuelve (None, None) si el índice no está completo (hay que ir a MySQL)
+    def listar_con_edad(self, solo_completo: bool = True) -> tuple:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(self.COMPLETO)
+        pipe.hgetall(self.INDICE)
+        generado, indice = pipe.execute()
+
+        if solo_completo and not generado:
+            return None, None
+        edad = time.time() - float(generado) if generado else None
+        return [Serializador.loads(indice[codigo]) for codigo in sorted(indice)], edad
+
+    # Igual que listar_con_edad pero devuelve el array JSON ya armado (bytes)
+    # Une los valores del hash tal como están guardados, sin decodificarlos ni volver a serializarlos
+    def listar_json_con_edad(self, solo_completo: bool = True) -> tuple:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(self.COMPLETO)
+        pipe.hgetall(self.INDICE)
+        generado, indice = pipe.execute()
+
+        if solo_completo and not generado:
+            return None, None
+        edad = time.time() - float(generado) if generado else None
+        return ("[" + ",".join(indice[codigo] for codigo in sorted(indice)) + "]").encode("utf-8"), edad
+
+    # Lista las máquinas del índice; None si el índice no está completo
+    def listar(self, solo_completo: bool = True) -> list:
+        return self.listar_con_edad(solo_completo)[0]
+
+    # Intenta tomar el bloqueo de reconstrucción; devuelve un token o None si otro lo tiene
+    def adquirir_bloqueo(self) -> str:
+        token = uuid.uuid4().hex
+        if self.redis.set(self.BLOQUEO, token, nx=True, px=self.BLOQUEO_TTL_MS):
+            return token
+        return None
+
+    def liberar_bloqueo(self, token: str):
+        self._liberar(keys=[self.BLOQUEO], args=[token])
+
+    # Versión actual del listado; se lee antes de consultar MySQL y se pasa a reconstruir()
+    def version(self) -> str:
+        return self.redis.get(self.VERSION) or "0"
+
+    # Vuelca el listado de MySQL a un hash temporal y lo pone en lugar del índice (ver _SCRIPT_REEMPLAZAR)
+    # Las máquinas que ya no están en MySQL desaparecen del índice; siempre queda marcado como completo
+    # Devuelve True si el volcado reemplazó al índice y False si hubo escrituras y se combinó
+    def reconstruir(self, maquinas: list, version: str) -> bool:
+        temporal = f"{self.INDICE}:reconstruccion:{uuid.uuid4().hex}"
+        pipe = self.redis.pipeline(transaction=False)
+        for inicio in range(0, len(maquinas), self.LOTE):
+            lote = maquinas[inicio:inicio + self.LOTE]
+            pipe.hset(temporal, mapping={self.normalizar(m["codigo"]): Serializador.texto(m) for m in lote})
+            pipe.expire(temporal, self.RECONSTRUCCION_TTL)
+        pipe.execute()
+        return self._reemplazar(
+            keys=[temporal, self.INDICE, self.VERSION, self.COMPLETO, self.CAMBIOS],
+            args=[version, time.time(), self.TTL_DURO]
+        ) == 1
+
+    # Avisa a todos los backends que una máquina (o el listado completo) cambió
+    def publicar_invalidacion(self, codigo: str = None, lote: LoteRedis = None):
+        mensaje = {"codigo": self.normalizar(codigo) if codigo else None}
+        (lote or self.redis).publish(self.CANAL_INVALIDACIONES, Serializador.texto(mensaje))
+
+    # Escucha invalidaciones en un hilo de fondo y llama a callback(codigo_normalizado)
+    # Si se pierde la conexión se llama a callback(None) para descartar toda la caché local
+    def suscribir_invalidaciones(self, callback):
+        def manejar(mensaje):
+            callback(Serializador.loads(mensaje["data"]).get("codigo"))
+
+        def manejar_error(error, pubsub, hilo):
+            callback(None)
+            time.sleep(1)
+
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.CANAL_INVALIDACIONES: manejar})
+        return pubsub.run_in_thread(sleep_time=1, daemon=True, exception_handler=manejar_error)
@@ -2,112 +2,294 @@
 # Responsabilidades: consultas SQL puras, sin lógica de negocio
 
 from app.database.mysql import MySQLConnection
+from app.utils.trigramas import Trigramas
+from app.utils.metricas import Metricas
 
+@Metricas.instrumentar("mysql")
 class MaquinaDAO:
+    # Columnas públicas (se omite codigo_normalizado, que es una columna generada para índices)
+    COLUMNAS = "codigo, tipo, estado, area, fecha, usuario"
+
     # Inserta una máquina con datos primitivos
     def insertar(self, codigo: str, tipo: str, estado: str, area: str, fecha: str, usuario: str = None) -> bool:
-        conn = MySQLConnection.conectar()
-        if not conn:
+        try:
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor()
+                query = """
+                    INSERT INTO maquinas (codigo, tipo, estado, area, fecha, usuario) 
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    """
+                cursor.execute(query, (codigo, tipo, estado, area, fecha, usuario))
+                # Trigramas del código en la misma transacción (índice de búsqueda parcial)
+                cursor.executemany(
+                    "INSERT IGNORE INTO maquinas_trigramas (trigrama, codigo) VALUES (%s, %s)",
+                    [(trigrama, codigo) for trigrama in Trigramas.generar(codigo)]
+                )
+                conn.commit()
+                cursor.close()
+                return True
+        except Exception:
             return False
-        
+
+    # Inserta varias máquinas en una sola transacción (INSERT multi-fila por bloques)
+    # filas: tuplas (codigo, tipo, estado, area, fecha, usuario). Si una falla no se guarda ninguna
+    # (el pool deshace la transacción sin confirmar al recibir la conexión de vuelta)
+    def insertar_lote(self, filas: list, tamano_bloque: int = 500) -> bool:
         try:
-            cursor = conn.cursor()
-            query = """
-                INSERT INTO maquinas (codigo, tipo, estado, area, fecha, usuario) 
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """
-            cursor.execute(query, (codigo, tipo, estado, area, fecha, usuario))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor()
+                query = """
+                    INSERT INTO maquinas (codigo, tipo, estado, area, fecha, usuario) 
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    """
+                for inicio in range(0, len(filas), tamano_bloque):
+                    bloque = filas[inicio:inicio + tamano_bloque]
+                    cursor.executemany(query, bloque)
+                    cursor.executemany(
+                        "INSERT IGNORE INTO maquinas_trigramas (trigrama, codigo) VALUES (%s, %s)",
+                        [(trigrama, fila[0]) for fila in bloque for trigrama in Trigramas.generar(fila[0])]
+                    )
+                conn.commit()
+                cursor.close()
+                return True
         except Exception:
             return False
 
     # Actualiza una máquina con datos primitivos
     def actualizar(self, codigo: str, tipo: str, estado: str, area: str, fecha: str, usuario: str = None) -> bool:
-        conn = MySQLConnection.conectar()
-        if not conn:
-            return False
-        
         try:
-            cursor = conn.cursor()
-            query = """
-                UPDATE maquinas 
-                SET tipo = %s, estado = %s, area = %s, fecha = %s, usuario = %s
-                WHERE codigo = %s
-                """
-            cursor.execute(query, (tipo, estado, area, fecha, usuario, codigo))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor()
+                query = """
+                    UPDATE maquinas 
+                    SET tipo = %s, estado = %s, area = %s, fecha = %s, usuario = %s
+                    WHERE codigo = %s
+                    """
+                cursor.execute(query, (tipo, estado, area, fecha, usuario, codigo))
+                conn.commit()
+                cursor.close()
+                return True
         except Exception:
             return False
 
     # Elimina una máquina por código exacto
     def eliminar(self, codigo: str) -> bool:
-        conn = MySQLConnection.conectar()
-        if not conn:
-            return False
-        
         try:
-            cursor = conn.cursor()
-            query = "DELETE FROM maquinas WHERE codigo = %s"
-            cursor.execute(query, (codigo,))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            return True
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor()
+                query = "DELETE FROM maquinas WHERE codigo = %s"
+                cursor.execute(query, (codigo,))
+                conn.commit()
+                cursor.close()
+                return True
         except Exception:
             return False
 
     # Busca por código exacto (case-sensitive)
     def buscar_por_codigo_exacto(self, codigo: str) -> dict:
-        conn = MySQLConnection.conectar()
-        if not conn:
+        try:
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor(dictionary=True)
+                query = f"SELECT {self.COLUMNAS} FROM maquinas WHERE codigo = %s"
+                cursor.execute(query, (codigo,))
+                resultado = cursor.fetchone()
+                cursor.close()
+                return resultado
+        except Exception:
             return None
-        
+
+    # Busca por código normalizado (minúsculas) usando el índice único
+    def buscar_por_codigo_normalizado(self, codigo_normalizado: str) -> dict:
         try:
-            cursor = conn.cursor(dictionary=True)
-            query = "SELECT * FROM maquinas WHERE codigo = %s"
-            cursor.execute(query, (codigo,))
-            resultado = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            return resultado
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor(dictionary=True)
+                query = f"SELECT {self.COLUMNAS} FROM maquinas WHERE codigo_normalizado = %s"
+                cursor.execute(query, (codigo_normalizado,))
+                resultado = cursor.fetchone()
+                cursor.close()
+                return resultado
+        except Exception:
+            return None
+
+    # Devuelve cuáles de los códigos normalizados ya existen (una consulta por bloque sobre el índice único)
+    def buscar_codigos_existentes(self, codigos_normalizados: list, tamano_bloque: int = 1000) -> set:
+        try:
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor()
+                existentes = set()
+                codigos = list(codigos_normalizados)
+                for inicio in range(0, len(codigos), tamano_bloque):
+                    bloque = codigos[inicio:inicio + tamano_bloque]
+                    marcadores = ", ".join(["%s"] * len(bloque))
+                    cursor.execute(f"SELECT codigo_normalizado FROM maquinas WHERE codigo_normalizado IN ({marcadores})", tuple(bloque))
+                    existentes.update(fila[0] for fila in cursor.fetchall())
+                cursor.close()
+                return existentes
         except Exception:
             return None
 
     # Obtiene todas las máquinas sin filtrar
     def listar_todas(self) -> list:
-        conn = MySQLConnection.conectar()
-        if not conn:
-            return []
-        
         try:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT * FROM maquinas")
-            lista = cursor.fetchall()
-            cursor.close()
-            conn.close()
-            return lista
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(f"SELECT {self.COLUMNAS} FROM maquinas")
+                lista = cursor.fetchall()
+                cursor.close()
+                return lista
         except Exception:
             return []
 
-    # Busca con filtro LIKE (para búsquedas parciales)
+    # Busca por código parcial (case-insensitive) usando el índice de trigramas
+    # Ordena por relevancia: coincidencia exacta, luego prefijo, luego códigos más cortos
     def buscar_similares(self, codigo_parcial: str) -> list:
-        conn = MySQLConnection.conectar()
-        if not conn:
-            return []
-        
         try:
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor(dictionary=True)
+                query, parametros = self._consulta_ordenada(codigo_parcial, None, None, None)
+                cursor.execute(query, parametros)
+                lista = cursor.fetchall()
+                cursor.close()
+                return lista
+        except Exception:
+            return []
+
+    # Recorre las máquinas con un cursor sin buffer: MySQL envía las filas a medida que se leen
+    # Produce bloques de "tamano_lote" filas, así la memoria no depende del tamaño de la tabla
+    # Mismo orden que buscar_similares si hay término; si no, por código (clave primaria)
+    # Los errores se propagan para que la respuesta en streaming pueda informarlos
+    def iterar(self, termino: str = None, tipo: str = None, estado: str = None,
+               area: str = None, tamano_lote: int = 500):
+        # Si el recorrido se corta (error o cliente desconectado) quedan filas en el socket:
+        # el pool lo detecta al devolver la conexión (unread_result) y la corta sin leer el resto
+        with MySQLConnection.conexion() as conn:
             cursor = conn.cursor(dictionary=True)
-            query = "SELECT * FROM maquinas WHERE codigo LIKE %s"
-            cursor.execute(query, (f"%{codigo_parcial}%",))
-            lista = cursor.fetchall()
+            query, parametros = self._consulta_ordenada(termino, tipo, estado, area)
+            cursor.execute(query, parametros)
+            while True:
+                bloque = cursor.fetchmany(tamano_lote)
+                if not bloque:
+                    break
+                yield bloque
             cursor.close()
-            conn.close()
-            return lista
+
+    # Busca con filtros opcionales y paginación por cursor (keyset)
+    # Sin término: ordenadas por código (clave primaria), filas con codigo > despues_de
+    # Con término: mismo orden por relevancia que buscar_similares; el cursor sigue siendo un código,
+    # su posición (relevancia, longitud, código) se calcula a partir del propio código
+    # Devuelve como máximo "limite" filas
+    def buscar_paginado(self, termino: str = None, tipo: str = None, estado: str = None,
+                        area: str = None, limite: int = 50, despues_de: str = None) -> list:
+        try:
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor(dictionary=True)
+                where, parametros = self._filtros(termino, tipo, estado, area)
+                termino = (termino or "").strip().lower()
+                if termino:
+                    rango, parametros_rango = self._rango(termino)
+                    if despues_de:
+                        where.append(f"({rango}, CHAR_LENGTH(codigo), codigo) > (%s, %s, %s)")
+                        parametros += parametros_rango + [
+                            self._rango_de(despues_de, termino), len(despues_de), despues_de
+                        ]
+                    orden = f" ORDER BY {rango}, CHAR_LENGTH(codigo), codigo LIMIT %s"
+                    parametros_orden = parametros_rango
+                else:
+                    if despues_de:
+                        where.append("codigo > %s")
+                        parametros.append(despues_de)
+                    orden = " ORDER BY codigo LIMIT %s"
+                    parametros_orden = []
+                query = f"SELECT {self.COLUMNAS} FROM maquinas"
+                if where:
+                    query += " WHERE " + " AND ".join(where)
+                query += orden
+                parametros += parametros_orden + [limite]
+                cursor.execute(query, tuple(parametros))
+                lista = cursor.fetchall()
+                cursor.close()
+                return lista
         except Exception:
             return []
+
+    # Cuenta las máquinas que cumplen los filtros
+    def contar(self, termino: str = None, tipo: str = None, estado: str = None, area: str = None) -> int:
+        try:
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor()
+                where, parametros = self._filtros(termino, tipo, estado, area)
+                query = "SELECT COUNT(*) FROM maquinas"
+                if where:
+                    query += " WHERE " + " AND ".join(where)
+                cursor.execute(query, tuple(parametros))
+                total = cursor.fetchone()[0]
+                cursor.close()
+                return total
+        except Exception:
+            return 0
+
+    # Consulta con filtros ordenada por relevancia del término (o por código si no hay término)
+    def _consulta_ordenada(self, termino: str, tipo: str, estado: str, area: str) -> tuple:
+        where, parametros = self._filtros(termino, tipo, estado, area)
+        query = f"SELECT {self.COLUMNAS} FROM maquinas"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        termino = (termino or "").strip().lower()
+        if termino:
+            rango, parametros_rango = self._rango(termino)
+            query += f" ORDER BY {rango}, CHAR_LENGTH(codigo), codigo"
+            parametros += parametros_rango
+        else:
+            query += " ORDER BY codigo"
+        return query, tuple(parametros)
+
+    # Relevancia de un código para el término: 0 coincidencia exacta, 1 prefijo, 2 subcadena
+    def _rango(self, termino: str) -> tuple:
+        return ("CASE WHEN codigo_normalizado = %s THEN 0 WHEN codigo_normalizado LIKE %s THEN 1 ELSE 2 END",
+                [termino, f"{self._escapar_like(termino)}%"])
+
+    # La misma relevancia calculada para un código dado (posición del cursor de paginación)
+    @staticmethod
+    def _rango_de(codigo: str, termino: str) -> int:
+        normalizado = codigo.strip().lower()
+        if normalizado == termino:
+            return 0
+        return 1 if normalizado.startswith(termino) else 2
+
+    # Construye las condiciones WHERE de los filtros opcionales
+    def _filtros(self, termino: str, tipo: str, estado: str, area: str) -> tuple:
+        where = []
+        parametros = []
+        if termino:
+            termino = termino.strip().lower()
+            trigramas = sorted(Trigramas.generar(termino))
+            if trigramas:
+                # Candidatos: códigos que contienen todos los trigramas del término (usa la PK del índice)
+                # El LIKE posterior solo verifica esos candidatos
+                marcadores = ", ".join(["%s"] * len(trigramas))
+                where.append(f"""codigo IN (
+                    SELECT codigo FROM maquinas_trigramas WHERE trigrama IN ({marcadores})
+                    GROUP BY codigo HAVING COUNT(*) = %s)""")
+                parametros += trigramas + [len(trigramas)]
+                where.append("codigo_normalizado LIKE %s")
+                parametros.append(f"%{self._escapar_like(termino)}%")
+            else:
+                # Términos de 1-2 caracteres (sin trigramas): subcadena como antes, "01" encuentra "MAQ-001"
+                # MySQL recorre el índice de codigo_normalizado (angosto) en lugar de las filas completas
+                where.append("codigo_normalizado LIKE %s")
+                parametros.append(f"%{self._escapar_like(termino)}%")
+        if tipo:
+            where.append("tipo = %s")
+            parametros.append(tipo)
+        if estado:
+            where.append("estado = %s")
+            parametros.append(estado)
+        if area:
+            where.append("area = %s")
+            parametros.append(area)
+        return where, parametros
+
+    # Escapa los comodines de LIKE para buscar el texto literal
+    @staticmethod
+    def _escapar_like(texto: str) -> str:
+        return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
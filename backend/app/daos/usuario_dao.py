@@ -1,82 +1,51 @@
 # DAO - Acceso a datos MySQL
 # Responsabilidades: consultas SQL puras, sin lógica de negocio
 
+import logging
 from app.database.mysql import MySQLConnection
-from app.utils.encryption import Encryption
+from app.utils.metricas import Metricas
 
+logger = logging.getLogger(__name__)
+
+@Metricas.instrumentar("mysql")
 class UsuarioDAO:
-    # Inserta usuario con datos primitivos
-    def insertar(self, nombre_completo: str, username: str, password: str, rol: str = "usuario") -> bool:
-        conn = MySQLConnection.conectar()
-        if not conn:
-            print("DEBUG: No se pudo conectar a MySQL")
-            return False
-        
+    # Inserta usuario con datos primitivos (la contraseña llega ya encriptada por el service)
+    def insertar(self, nombre_completo: str, username: str, password_encriptado: str, rol: str = "usuario") -> bool:
         try:
-            cursor = conn.cursor()
-            password_encriptado = Encryption.encriptar_password(password)
-            print(f"DEBUG: Password encriptado: {password_encriptado}")
-            query = """
-                INSERT INTO usuarios (nombre_completo, username, password, rol) 
-                VALUES (%s, %s, %s, %s)
-                """
-            print(f"DEBUG: Query: {query}")
-            print(f"DEBUG: Parámetros: {nombre_completo}, {username}, {password_encriptado}, {rol}")
-            cursor.execute(query, (nombre_completo, username, password_encriptado, rol))
-            conn.commit()
-            cursor.close()
-            conn.close()
-            print("DEBUG: Usuario insertado correctamente")
-            return True
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor()
+                query = """
+                    INSERT INTO usuarios (nombre_completo, username, password, rol) 
+                    VALUES (%s, %s, %s, %s)
+                    """
+                cursor.execute(query, (nombre_completo, username, password_encriptado, rol))
+                conn.commit()
+                cursor.close()
+                return True
         except Exception as e:
-            print(f"DEBUG: Error en insertar: {e}")
-            print(f"DEBUG: Tipo de error: {type(e)}")
+            # Sin parámetros: incluirían el hash de la contraseña
+            logger.error("Error insertando usuario: %s", type(e).__name__, extra={"username": username})
             return False
 
-    # Guarda usuario usando objeto Usuario (compatibilidad)
-    def guardar(self, usuario) -> bool:
+    # Guarda usuario usando objeto Usuario (compatibilidad); su contraseña se reemplaza por el hash
+    def guardar(self, usuario, password_encriptado: str) -> bool:
         return self.insertar(
             usuario.nombre_completo,
             usuario.username,
-            usuario.password,
+            password_encriptado,
             usuario.rol
         )
 
-    # Verifica credenciales de usuario
-    def verificar_credenciales(self, username: str, password: str) -> dict:
-        conn = MySQLConnection.conectar()
-        if not conn:
-            return None
-        
-        try:
-            cursor = conn.cursor(dictionary=True)
-            query = "SELECT * FROM usuarios WHERE username = %s"
-            cursor.execute(query, (username,))
-            usuario = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            if usuario and Encryption.verificar_password(password, usuario['password']):
-                return usuario
-            return None
-        except Exception as e:
-            print(f"Error en verificar_credenciales: {e}")
-            return None
-
     # Obtiene usuario por username
     def obtener_por_username(self, username: str) -> dict:
-        conn = MySQLConnection.conectar()
-        if not conn:
-            return None
-        
         try:
-            cursor = conn.cursor(dictionary=True)
-            query = "SELECT * FROM usuarios WHERE username = %s"
-            cursor.execute(query, (username,))
-            resultado = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            return resultado
+            with MySQLConnection.conexion() as conn:
+                cursor = conn.cursor(dictionary=True)
+                query = "SELECT * FROM usuarios WHERE username = %s"
+                cursor.execute(query, (username,))
+                resultado = cursor.fetchone()
+                cursor.close()
+                return resultado
         except Exception:
             return None
 
@@ -85,5 +54,5 @@ class UsuarioDAO:
         return self.obtener_por_username(username)
 
     # Crea usuario con datos primitivos (método legacy)
-    def crear_usuario(self, nombre_completo: str, username: str, password: str, rol: str = "usuario") -> bool:
-        return self.insertar(nombre_completo, username, password, rol)
+    def crear_usuario(self, nombre_completo: str, username: str, password_encriptado: str, rol: str = "usuario") -> bool:
+        return self.insertar(nombre_completo, username, password_encriptado, rol)
@@ -0,0 +1,42 @@
+# DAO - Contadores de versión de datos en Redis
+# Responsabilidades: incrementar y leer versiones (por colección y por máquina), sin lógica de negocio
+# Los errores de Redis se propagan para que el service decida cómo degradar
+
+import uuid
+from app.database.redis_client import redis_client, LoteRedis
+from app.utils.metricas import Metricas
+
+@Metricas.instrumentar("redis")
+class VersionDAO:
+    PREFIJO = "siglab:version:"
+    # Identificador aleatorio de la "época" de los contadores: si Redis se vacía, los contadores
+    # vuelven a empezar pero con otra época, así nunca se repite un ETag con datos distintos
+    EPOCA = "siglab:version:epoca"
+
+    # Colecciones versionadas
+    MAQUINAS = "maquinas"
+    MANTENIMIENTOS = "mantenimientos"
+
+    def __init__(self):
+        self.redis = redis_client
+
+    # Clave del contador de una máquina (código normalizado)
+    @staticmethod
+    def maquina(codigo: str) -> str:
+        return "maquina:" + str(codigo).strip().lower()
+
+    # Incrementa varios contadores en un solo viaje de red; con "lote" solo se encolan
+    def incrementar(self, *nombres: str, lote: LoteRedis = None):
+        pipe = lote or self.redis.pipeline(transaction=False)
+        for nombre in nombres:
+            pipe.incr(self.PREFIJO + nombre)
+        if lote is None:
+            pipe.execute()
+
+    # Devuelve [época, versión1, versión2, ...] (las versiones que no existen valen 0)
+    def obtener(self, *nombres: str) -> list:
+        valores = self.redis.mget([self.EPOCA] + [self.PREFIJO + nombre for nombre in nombres])
+        if valores[0] is None:
+            self.redis.set(self.EPOCA, uuid.uuid4().hex[:8], nx=True)
+            valores[0] = self.redis.get(self.EPOCA)
+        return [valores[0]] + [int(valor or 0) for valor in valores[1:]]
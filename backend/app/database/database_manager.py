@@ -1,9 +1,14 @@
 # Este archivo encapsula (envuelve) todas las operaciones de bases de datos
 # Simplifica el acceso a MySQL y MongoDB desde un solo lugar
 
+import logging
+
 # Importamos las clases que manejan las conexiones
 from app.database.mysql import MySQLConnection
 from app.database.mongodb import MongoDB
+from app.database.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
 
 class DatabaseManager:
     # Esta clase contiene métodos estáticos para gestionar las bases de datos
@@ -14,12 +19,16 @@ class DatabaseManager:
         # Intentamos inicializar MySQL
         try:
             MySQLConnection.inicializar_base_datos()
+            # Creamos el pool al arrancar para no pagar su creación en la primera petición
+            MySQLConnection.get_pool()
         except Exception as e:
             pass
         
-        # Intentamos conectar a MongoDB
+        # Intentamos conectar a MongoDB y preparar sus índices
         try:
             MongoDB.conectar()
+            informe = MongoDB.asegurar_indices()
+            logger.info("Índices MongoDB: %s", informe)
         except Exception as e:
             pass
     
@@ -28,12 +37,27 @@ class DatabaseManager:
     def cerrar():
         # Cerramos la conexión a MongoDB
         MongoDB.cerrar()
+        # Cerramos las conexiones del pool de MySQL
+        MySQLConnection.cerrar()
+    
+    # Estos métodos verifican que cada base de datos responda (lanzan excepción si no)
+    @staticmethod
+    def ping_mysql(timeout: float = None):
+        MySQLConnection.ping(timeout)
+
+    @staticmethod
+    def ping_mongodb():
+        MongoDB.ping()
+
+    @staticmethod
+    def ping_redis():
+        redis_client.ping()
     
-    # Este método obtiene una conexión a MySQL
+    # Este método presta una conexión a MySQL (usar con "with"; se devuelve al pool al salir)
     @staticmethod
     def obtener_mysql():
-        # Retornamos una conexión a MySQL
-        return MySQLConnection.conectar()
+        # Retornamos el administrador de contexto del pool de MySQL
+        return MySQLConnection.conexion()
     
     # Este método obtiene la base de datos MongoDB
     @staticmethod
@@ -1,10 +1,22 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, IndexModel, ASCENDING, DESCENDING
 import os
 
 class MongoDB:
     _client = None
     _db = None
 
+    # Índices declarativos por colección (se crean al arrancar; crearlos de nuevo no hace nada)
+    INDICES = {
+        "mantenimientos": [
+            # Historial por máquina ordenado por fecha y borrado por máquina
+            IndexModel([("codigo_maquina_normalizado", ASCENDING), ("fecha", DESCENDING)], name="idx_mant_codigo_fecha"),
+            # Filtros de buscar_con_filtros
+            IndexModel([("tecnico", ASCENDING)], name="idx_mant_tecnico"),
+            IndexModel([("empresa", ASCENDING)], name="idx_mant_empresa"),
+            IndexModel([("tipo", ASCENDING)], name="idx_mant_tipo"),
+        ]
+    }
+
     @classmethod
     def conectar(cls):
         if cls._client is None:
@@ -38,8 +50,51 @@ class MongoDB:
                         raise Exception(f"No se pudo conectar a MongoDB después de {max_retries} intentos: {e}")
         return cls._db
 
+    # Completa el código normalizado en documentos antiguos y crea los índices declarados
+    # Devuelve un informe con los índices creados y los ya existentes por colección
+    @classmethod
+    def asegurar_indices(cls) -> dict:
+        db = cls.conectar()
+        informe = {}
+
+        # Backfill: documentos previos al campo codigo_maquina_normalizado
+        resultado = db["mantenimientos"].update_many(
+            {"codigo_maquina_normalizado": {"$exists": False}},
+            [{"$set": {"codigo_maquina_normalizado": {
+                "$toLower": {"$trim": {"input": {"$toString": "$codigo_maquina"}}}
+            }}}]
+        )
+        informe["backfill_mantenimientos"] = resultado.modified_count
+
+        for nombre_coleccion, indices in cls.INDICES.items():
+            coleccion = db[nombre_coleccion]
+            existentes = set(coleccion.index_information())
+            coleccion.create_indexes(indices)
+            nombres = [indice.document["name"] for indice in indices]
+            informe[nombre_coleccion] = {
+                "creados": [nombre for nombre in nombres if nombre not in existentes],
+                "existentes": [nombre for nombre in nombres if nombre in existentes]
+            }
+        return informe
+
+    # Verifica que MongoDB responda (sin reintentos: si nunca se conectó, falla enseguida)
+    @classmethod
+    def ping(cls):
+        if cls._client is None:
+            raise Exception("MongoDB no está conectado")
+        cls._client.admin.command('ping')
+
     @classmethod
     def cerrar(cls):
         if cls._client:
             cls._client.close()
-            cls._client = None
\ No newline at end of file
+            cls._client = None
+
+    # En el proceso hijo tras un fork: MongoClient no es seguro entre procesos (sus hilos de
+    # monitoreo no sobreviven al fork), se descarta y cada worker conecta el suyo
+    @classmethod
+    def _tras_fork(cls):
+        cls._client = None
+        cls._db = None
+
+os.register_at_fork(after_in_child=MongoDB._tras_fork)
@@ -3,6 +3,26 @@
 import mysql.connector
 from mysql.connector import Error
 import os
+import logging
+import threading
+from contextlib import contextmanager
+from app.database.pool_mysql import PoolMySQL
+
+logger = logging.getLogger(__name__)
+
+# Ajusta el pool al presupuesto de conexiones: MySQL admite MYSQL_MAX_CONNECTIONS en total y se reparten
+# entre todos los procesos (BACKEND_INSTANCES contenedores × WEB_CONCURRENCY workers cada uno)
+# Se recorta primero el desborde y después el tamaño base
+def _ajustar_al_presupuesto(tamano: int, desborde: int) -> tuple:
+    maximo = int(os.getenv('MYSQL_MAX_CONNECTIONS', '151'))
+    # Conexiones que quedan libres para administración, migraciones y clientes externos
+    reservadas = int(os.getenv('MYSQL_RESERVED_CONNECTIONS', '10'))
+    procesos = max(int(os.getenv('BACKEND_INSTANCES', '1')), 1) * max(int(os.getenv('WEB_CONCURRENCY', '1')), 1)
+    por_proceso = max((maximo - reservadas) // procesos, 1)
+    if tamano + desborde <= por_proceso:
+        return tamano, desborde
+    tamano_ajustado = min(tamano, por_proceso)
+    return tamano_ajustado, por_proceso - tamano_ajustado
 
 class MySQLConnection:
     # Variables de entorno con valores por defecto
@@ -10,6 +30,19 @@ class MySQLConnection:
     PASSWORD = os.getenv('MYSQL_PASSWORD', 'Clubpengui1')
     HOST = os.getenv('MYSQL_HOST', 'mysql')
     DATABASE = os.getenv('MYSQL_DATABASE', 'proyecto_maquinas')
+    # Conexiones que el pool mantiene abiertas
+    POOL_SIZE_PEDIDO = int(os.getenv('MYSQL_POOL_SIZE', '10'))
+    # Conexiones extra permitidas en ráfagas (se cierran al devolverse)
+    POOL_OVERFLOW_PEDIDO = int(os.getenv('MYSQL_POOL_OVERFLOW', '5'))
+    # Valores efectivos de cada proceso, dentro del presupuesto de conexiones
+    POOL_SIZE, POOL_OVERFLOW = _ajustar_al_presupuesto(POOL_SIZE_PEDIDO, POOL_OVERFLOW_PEDIDO)
+    # Segundos que una petición espera una conexión libre antes de fallar
+    POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', '10'))
+    # Vida máxima de una conexión en segundos (menor que wait_timeout de MySQL)
+    POOL_RECYCLE = float(os.getenv('MYSQL_POOL_RECYCLE', '1800'))
+    # Se hace ping antes de reutilizar una conexión que estuvo inactiva más de estos segundos
+    POOL_PING = float(os.getenv('MYSQL_POOL_PING', '30'))
+    _lock_pool = threading.Lock()
 
     @staticmethod
     def inicializar_base_datos():
@@ -60,7 +93,9 @@ class MySQLConnection:
                         estado VARCHAR(50) NOT NULL,
                         area VARCHAR(100) NOT NULL,
                         fecha DATE NOT NULL,
-                        usuario VARCHAR(50)
+                        usuario VARCHAR(50),
+                        codigo_normalizado VARCHAR(50) AS (LOWER(TRIM(codigo))) STORED,
+                        UNIQUE INDEX idx_maquinas_codigo_normalizado (codigo_normalizado)
                     )
                 """)
                 
@@ -70,6 +105,57 @@ class MySQLConnection:
                 except:
                     pass
 
+                # Migración: columna generada con el código en minúsculas (se calcula sola para filas existentes)
+                try:
+                    cursor.execute("ALTER TABLE maquinas ADD COLUMN codigo_normalizado VARCHAR(50) AS (LOWER(TRIM(codigo))) STORED")
+                except:
+                    pass
+
+                # Migración: índice único para búsquedas case-insensitive O(log N)
+                try:
+                    cursor.execute("CREATE UNIQUE INDEX idx_maquinas_codigo_normalizado ON maquinas (codigo_normalizado)")
+                except Error as e:
+                    # 1061 = el índice ya existe; otro error suele indicar duplicados previos
+                    # que difieren solo en mayúsculas: se crea un índice no único para no perder el O(log N)
+                    if e.errno != 1061:
+                        try:
+                            cursor.execute("CREATE INDEX idx_maquinas_codigo_normalizado ON maquinas (codigo_normalizado)")
+                        except:
+                            pass
+
+                # Crear tabla de trigramas para búsqueda parcial de códigos
+                # (se borran solos con la máquina gracias al ON DELETE CASCADE)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS maquinas_trigramas (
+                        trigrama CHAR(3) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+                        codigo VARCHAR(50) NOT NULL,
+                        PRIMARY KEY (trigrama, codigo),
+                        INDEX idx_trigramas_codigo (codigo),
+                        FOREIGN KEY (codigo) REFERENCES maquinas (codigo) ON DELETE CASCADE
+                    )
+                """)
+
+                # Migración: indexar las máquinas que aún no tienen trigramas
+                from app.utils.trigramas import Trigramas
+                cursor.execute("""
+                    SELECT codigo FROM maquinas m
+                    WHERE NOT EXISTS (SELECT 1 FROM maquinas_trigramas t WHERE t.codigo = m.codigo)
+                """)
+                filas = [(trigrama, codigo) for (codigo,) in cursor.fetchall() for trigrama in Trigramas.generar(codigo)]
+                for inicio in range(0, len(filas), 5000):
+                    cursor.executemany(
+                        "INSERT IGNORE INTO maquinas_trigramas (trigrama, codigo) VALUES (%s, %s)",
+                        filas[inicio:inicio + 5000]
+                    )
+
+                # Índices para los filtros de búsqueda paginada
+                # (InnoDB añade la clave primaria a cada índice, así que sirven también para ORDER BY codigo)
+                for columna in ("tipo", "estado", "area"):
+                    try:
+                        cursor.execute(f"CREATE INDEX idx_maquinas_{columna} ON maquinas ({columna})")
+                    except:
+                        pass
+
                 # Crear admin por defecto
                 cursor.execute("SELECT * FROM usuarios WHERE username = 'admin'")
                 if not cursor.fetchone():
@@ -90,41 +176,80 @@ class MySQLConnection:
 
     # Pool de conexiones
     _pool = None
+    # Pool heredado del proceso padre (se conserva la referencia para que no se cierre al recolectarse)
+    _heredado = None
+
+    @classmethod
+    def _crear_conexion(cls):
+        return mysql.connector.connect(
+            host=cls.HOST,
+            user=cls.USER,
+            password=cls.PASSWORD,
+            database=cls.DATABASE,
+            connection_timeout=5,
+            autocommit=False
+        )
 
     @classmethod
     def get_pool(cls):
-        # Administra pool de conexiones para rendimiento
+        # Administra pool de conexiones para rendimiento (las conexiones se abren a demanda)
         if cls._pool is None:
-            try:
-                print(f"DEBUG: Creando pool de conexiones con host={cls.HOST}, user={cls.USER}, database={cls.DATABASE}")
-                cls._pool = mysql.connector.pooling.MySQLConnectionPool(
-                    pool_name="mypool",
-                    pool_size=5,
-                    pool_reset_session=True,
-                    host=cls.HOST,
-                    user=cls.USER,
-                    password=cls.PASSWORD,
-                    database=cls.DATABASE,
-                    connection_timeout=5,
-                    autocommit=False
-                )
-                print("DEBUG: Pool de conexiones creado exitosamente")
-            except Error as e:
-                print(f"DEBUG: Error creando pool de conexiones: {e}")
-                return None
+            with cls._lock_pool:
+                if cls._pool is None:
+                    if (cls.POOL_SIZE, cls.POOL_OVERFLOW) != (cls.POOL_SIZE_PEDIDO, cls.POOL_OVERFLOW_PEDIDO):
+                        logger.warning("Pool MySQL reducido para no superar MYSQL_MAX_CONNECTIONS entre todos los workers",
+                                       extra={"pedido": cls.POOL_SIZE_PEDIDO + cls.POOL_OVERFLOW_PEDIDO,
+                                              "asignado": cls.POOL_SIZE + cls.POOL_OVERFLOW})
+                    logger.info("Creando pool de conexiones MySQL", extra={
+                        "host": cls.HOST, "database": cls.DATABASE,
+                        "tamano": cls.POOL_SIZE, "desborde": cls.POOL_OVERFLOW, "pid": os.getpid()
+                    })
+                    cls._pool = PoolMySQL(
+                        cls._crear_conexion,
+                        tamano=cls.POOL_SIZE,
+                        desborde=cls.POOL_OVERFLOW,
+                        timeout=cls.POOL_TIMEOUT,
+                        reciclar=cls.POOL_RECYCLE,
+                        ping_inactiva=cls.POOL_PING
+                    )
         return cls._pool
 
-    @staticmethod
-    def conectar():
-        # Obtiene conexión del pool
-        pool = MySQLConnection.get_pool()
-        if not pool:
-            return None
-        
+    # Presta una conexión del pool y la devuelve siempre al salir del bloque "with"
+    # Al devolverla se deshace lo no confirmado; si quedó inservible (por ejemplo, con filas sin leer) se descarta
+    # Lanza PoolAgotadoError si no se libera ninguna conexión dentro de MYSQL_POOL_TIMEOUT (o "timeout")
+    @classmethod
+    @contextmanager
+    def conexion(cls, timeout: float = None):
+        pool = cls.get_pool()
+        conn = pool.obtener(timeout)
         try:
-            conn = pool.get_connection()
-            if conn.is_connected():
-                return conn
-            return None
-        except Exception as e:
-            return None
\ No newline at end of file
+            yield conn
+        finally:
+            pool.devolver(conn)
+
+    # Verifica que MySQL responda usando una conexión del pool (espera como mucho "timeout" por una libre)
+    @classmethod
+    def ping(cls, timeout: float = None):
+        with cls.conexion(timeout) as conn:
+            conn.ping(reconnect=False)
+
+    @classmethod
+    def estadisticas(cls) -> dict:
+        return cls._pool.estadisticas() if cls._pool is not None else {}
+
+    @classmethod
+    def cerrar(cls):
+        # Cierra las conexiones inactivas del pool al apagar el servidor
+        if cls._pool is not None:
+            cls._pool.cerrar()
+            cls._pool = None
+
+    # En el proceso hijo tras un fork: el pool heredado comparte sockets con el padre, así que se
+    # abandona sin cerrarlo (cerrarlo enviaría QUIT por conexiones del padre) y se crea otro al usarlo
+    @classmethod
+    def _tras_fork(cls):
+        cls._heredado = cls._pool
+        cls._pool = None
+        cls._lock_pool = threading.Lock()
+
+os.register_at_fork(after_in_child=MySQLConnection._tras_fork)
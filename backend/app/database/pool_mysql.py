@@ -0,0 +1,201 @@
+# Pool de conexiones MySQL propio
+# Reemplaza al pool de mysql-connector, que devuelve error apenas se agota y reautentica la sesión
+# en cada devolución. Este pool:
+#   - tiene un tamaño base y un desborde (conexiones extra que se cierran al devolverse)
+#   - hace esperar a quien pide una conexión cuando están todas ocupadas (con timeout)
+#   - verifica con ping las conexiones inactivas y recicla las que superan su vida máxima
+#   - lleva métricas de uso, espera y timeouts
+
+import time
+import threading
+from collections import deque
+
+class PoolAgotadoError(Exception):
+    pass
+
+class _Entrada:
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.creada = time.monotonic()
+        self.devuelta = self.creada
+
+class PoolMySQL:
+    def __init__(self, crear_conexion, tamano: int, desborde: int = 0, timeout: float = 10.0,
+                 reciclar: float = 1800.0, ping_inactiva: float = 30.0):
+        self._crear_conexion = crear_conexion
+        self.tamano = tamano
+        self.desborde = desborde
+        self.timeout = timeout
+        self.reciclar = reciclar
+        self.ping_inactiva = ping_inactiva
+
+        self._condicion = threading.Condition()
+        self._libres = deque()
+        self._abiertas = 0
+        self._en_uso = {}  # id(conexión) -> _Entrada
+        self._esperando = 0
+        self._cerrado = False
+
+        # Métricas acumuladas
+        self.prestamos = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.recicladas = 0
+        self.descartadas = 0
+
+    # Pide una conexión; espera hasta "timeout" segundos si están todas en uso
+    def obtener(self, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        limite = inicio + timeout
+
+        with self._condicion:
+            while True:
+                if self._cerrado:
+                    raise PoolAgotadoError("El pool de MySQL está cerrado")
+                if self._libres:
+                    # LIFO: la más recién usada, las demás pueden envejecer y reciclarse
+                    entrada = self._libres.pop()
+                    break
+                if self._abiertas < self.tamano + self.desborde:
+                    # Se reserva el lugar y la conexión se abre fuera del lock
+                    self._abiertas += 1
+                    entrada = None
+                    break
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    self.timeouts += 1
+                    raise PoolAgotadoError(f"No hay conexiones MySQL libres tras esperar {timeout:.1f}s")
+                self._esperando += 1
+                try:
+                    self._condicion.wait(restante)
+                finally:
+                    self._esperando -= 1
+
+        try:
+            entrada = self._preparar(entrada)
+        except Exception:
+            with self._condicion:
+                self._abiertas -= 1
+                self._condicion.notify()
+            raise
+
+        espera = time.monotonic() - inicio
+        with self._condicion:
+            self._en_uso[id(entrada.conexion)] = entrada
+            self.prestamos += 1
+            self.espera_total += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+        return entrada.conexion
+
+    # Devuelve una conexión; si quedó en mal estado, con filas sin leer (o se pide descartarla) se cierra
+    def devolver(self, conexion, descartar: bool = False):
+        with self._condicion:
+            entrada = self._en_uso.pop(id(conexion), None)
+        if entrada is None:
+            return
+
+        # Recorrido sin buffer cortado a mitad (cliente desconectado, error): quedan filas en el socket
+        # y tanto rollback() como close() del conector las leerían todas antes de terminar
+        abortar = bool(getattr(conexion, "unread_result", False))
+        if abortar:
+            descartar = True
+        elif not descartar:
+            try:
+                # Termina cualquier transacción abierta
+                conexion.rollback()
+            except Exception:
+                descartar = True
+
+        with self._condicion:
+            # Las conexiones de desborde no se conservan cuando ya hay "tamano" abiertas
+            if descartar or self._cerrado or self._abiertas > self.tamano:
+                self._abiertas -= 1
+                self.descartadas += 1 if descartar else 0
+                cerrar = True
+            else:
+                entrada.devuelta = time.monotonic()
+                self._libres.append(entrada)
+                cerrar = False
+            self._condicion.notify()
+
+        if cerrar:
+            if abortar:
+                self._abortar_conexion(conexion)
+            else:
+                self._cerrar_conexion(conexion)
+
+    # Abre una conexión nueva o valida una reutilizada (reciclaje por edad y ping si estuvo inactiva)
+    def _preparar(self, entrada: _Entrada) -> _Entrada:
+        if entrada is None:
+            return _Entrada(self._crear_conexion())
+
+        ahora = time.monotonic()
+        if ahora - entrada.creada > self.reciclar:
+            self._cerrar_conexion(entrada.conexion)
+            with self._condicion:
+                self.recicladas += 1
+            return _Entrada(self._crear_conexion())
+
+        if ahora - entrada.devuelta > self.ping_inactiva:
+            try:
+                entrada.conexion.ping(reconnect=False)
+            except Exception:
+                self._cerrar_conexion(entrada.conexion)
+                with self._condicion:
+                    self.descartadas += 1
+                return _Entrada(self._crear_conexion())
+        return entrada
+
+    @staticmethod
+    def _cerrar_conexion(conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    # Cierra una conexión con un resultado a medio leer sin recorrer el resto
+    # El servidor corta la conexión (KILL desde una conexión auxiliar, fuera del pool); después el cierre
+    # local encuentra el socket terminado en lugar de seguir recibiendo filas
+    def _abortar_conexion(self, conexion):
+        try:
+            auxiliar = self._crear_conexion()
+            try:
+                cursor = auxiliar.cursor()
+                cursor.execute(f"KILL CONNECTION {int(conexion.connection_id)}")
+                cursor.close()
+            finally:
+                auxiliar.close()
+        except Exception:
+            pass
+        self._cerrar_conexion(conexion)
+
+    # Cierra las conexiones libres; las que están en uso se cierran al devolverse
+    def cerrar(self):
+        with self._condicion:
+            self._cerrado = True
+            libres = list(self._libres)
+            self._libres.clear()
+            self._abiertas -= len(libres)
+            self._condicion.notify_all()
+        for entrada in libres:
+            self._cerrar_conexion(entrada.conexion)
+
+    # Estado actual y métricas acumuladas del pool
+    def estadisticas(self) -> dict:
+        with self._condicion:
+            return {
+                "tamano": self.tamano,
+                "desborde": self.desborde,
+                "abiertas": self._abiertas,
+                "en_uso": len(self._en_uso),
+                "libres": len(self._libres),
+                "esperando": self._esperando,
+                "prestamos": self.prestamos,
+                "timeouts": self.timeouts,
+                "espera_total_s": round(self.espera_total, 6),
+                "espera_maxima_s": round(self.espera_maxima, 6),
+                "recicladas": self.recicladas,
+                "descartadas": self.descartadas
+            }
@@ -1,8 +1,62 @@
-import redis
+# Conexión Redis - Cliente compartido por los DAOs del proceso y agrupación de comandos
+#   - Pool bloqueante acotado: con todas las conexiones ocupadas se espera REDIS_POOL_TIMEOUT y luego
+#     falla, en lugar de abrir conexiones sin límite
+#   - Timeouts de conexión y de lectura: un Redis lento produce un error rápido y el service degrada a MySQL
+#   - Ping de verificación en conexiones inactivas por más de REDIS_HEALTH_CHECK segundos
+#   - Parser hiredis (en C) si está instalado; REDIS_HIREDIS=0 fuerza el parser en Python
+
 import os
+import redis
+from redis.utils import HIREDIS_AVAILABLE
+from app.utils.metricas import Metricas
+
+class RedisConfig:
+    HOST = os.getenv("REDIS_HOST", "redis")
+    PORT = int(os.getenv("REDIS_PORT", "6379"))
+    # Conexiones máximas del pool de cada proceso (el hilo de invalidaciones ocupa una)
+    MAX_CONEXIONES = int(os.getenv("REDIS_MAX_CONNECTIONS", "32"))
+    # Segundos que se espera una conexión libre del pool
+    POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "0.5"))
+    # Segundos para abrir la conexión y para esperar cada respuesta
+    CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "0.5"))
+    SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1.0"))
+    # Ping antes de usar una conexión inactiva por más de estos segundos
+    HEALTH_CHECK = int(os.getenv("REDIS_HEALTH_CHECK", "30"))
+    HIREDIS = os.getenv("REDIS_HIREDIS", "1") != "0"
+
+    @classmethod
+    def crear_pool(cls) -> redis.BlockingConnectionPool:
+        opciones = {}
+        if not cls.HIREDIS and HIREDIS_AVAILABLE:
+            from redis._parsers import _RESP2Parser
+            opciones["parser_class"] = _RESP2Parser
+        return redis.BlockingConnectionPool(
+            host=cls.HOST,
+            port=cls.PORT,
+            max_connections=cls.MAX_CONEXIONES,
+            timeout=cls.POOL_TIMEOUT,
+            socket_connect_timeout=cls.CONNECT_TIMEOUT,
+            socket_timeout=cls.SOCKET_TIMEOUT,
+            socket_keepalive=True,
+            health_check_interval=cls.HEALTH_CHECK,
+            decode_responses=True,
+            **opciones
+        )
+
+redis_client = redis.Redis(connection_pool=RedisConfig.crear_pool())
+
+# Agrupa los comandos de una operación del service y los envía en un solo viaje de red
+# Los DAOs reciben el lote en lugar de ejecutar; el service llama a ejecutar() una vez al final
+# Con transaccion=True se envuelven en MULTI/EXEC: los demás clientes ven todos los cambios o ninguno
+@Metricas.instrumentar("redis")
+class LoteRedis:
+    def __init__(self, transaccion: bool = True):
+        self._pipe = redis_client.pipeline(transaction=transaccion)
+
+    # Los comandos (hset, hdel, incr, publish...) se encolan directamente en el pipeline
+    def __getattr__(self, nombre):
+        return getattr(self._pipe, nombre)
 
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "redis"),
-    port=6379,
-    decode_responses=True
-)
+    # Envía todos los comandos y devuelve sus resultados en orden
+    def ejecutar(self) -> list:
+        return self._pipe.execute()
@@ -22,79 +22,75 @@ class InformeMaquinaDTO(BaseModel):
         from_attributes = True
     
     @classmethod
-    def crear_reporte_general(cls, codigo_filtro: str = None) -> List['InformeMaquinaDTO']:
+    def crear_reporte_general(cls, codigo_filtro: str = None, incluir_mantenimientos: bool = False) -> List['InformeMaquinaDTO']:
         # Método estático que obtiene datos de MySQL + MongoDB y crea DTOs
         # El DTO mismo coordina la obtención de datos de ambas bases
-        try:
-            # DAOs para acceder a ambas bases de datos
-            maquina_dao = MaquinaDAO()
-            mantenimiento_dao = MantenimientoDAO()
-            
-            # Obtener máquinas desde MySQL
-            if codigo_filtro:
-                maquinas = maquina_dao.buscar_similares(codigo_filtro)
-            else:
-                maquinas = maquina_dao.listar_todas()
-            
-            if not maquinas:
-                return []
-            
-            # Obtener todos los mantenimientos desde MongoDB con manejo de errores
-            try:
-                todos_mantenimientos = mantenimiento_dao.listar_todos()
-            except Exception as mongo_error:
-                # Si MongoDB falla, devolver máquinas sin mantenimientos
-                todos_mantenimientos = []
-            
-            # Agrupar mantenimientos por máquina (case-insensitive)
+        # DAOs para acceder a ambas bases de datos
+        maquina_dao = MaquinaDAO()
+        mantenimiento_dao = MantenimientoDAO()
+        
+        # Obtener máquinas desde MySQL
+        if codigo_filtro:
+            maquinas = maquina_dao.buscar_similares(codigo_filtro)
+        else:
+            maquinas = maquina_dao.listar_todas()
+        
+        if not maquinas:
+            return []
+        
+        # Con filtro, MongoDB solo agrega los mantenimientos de las máquinas encontradas
+        codigos = [str(maquina.get("codigo", "")).strip().lower() for maquina in maquinas]
+        codigos_en_alcance = codigos if codigo_filtro else None
+        
+        # Conteo y fecha más reciente calculados en MongoDB ($group), sin traer los documentos
+        # Si MongoDB falla el error llega al service (no se informan máquinas sin mantenimientos)
+        resumen = mantenimiento_dao.resumen_por_maquinas(codigos_en_alcance)
+        
+        # Listas completas de mantenimientos solo si se piden
+        mantenimientos_por_maquina = {}
+        if incluir_mantenimientos:
+            mantenimientos_por_maquina = mantenimiento_dao.listar_por_maquinas(codigos_en_alcance)
+        
+        # Crear DTOs combinando datos de ambas bases
+        return [
+            cls._combinar(maquina, resumen.get(codigo_maq, {}), mantenimientos_por_maquina.get(codigo_maq, []))
+            for maquina, codigo_maq in zip(maquinas, codigos)
+        ]
+
+    @classmethod
+    def iterar_reporte_general(cls, codigo_filtro: str = None, incluir_mantenimientos: bool = False, tamano_lote: int = 500):
+        # Versión en streaming del informe: recorre MySQL con un cursor sin buffer y, por cada bloque
+        # de máquinas, consulta en MongoDB solo los mantenimientos de ese bloque ($in sobre el índice)
+        # La memoria depende del tamaño del bloque, no de la cantidad de máquinas
+        maquina_dao = MaquinaDAO()
+        mantenimiento_dao = MantenimientoDAO()
+        
+        for bloque in maquina_dao.iterar(codigo_filtro, tamano_lote=tamano_lote):
+            codigos = [str(maquina.get("codigo", "")).strip().lower() for maquina in bloque]
+            resumen = mantenimiento_dao.resumen_por_maquinas(codigos)
             mantenimientos_por_maquina = {}
-            for mant in todos_mantenimientos:
-                codigo_mt = mant.get("codigo_maquina")
-                if codigo_mt:
-                    codigo_key = str(codigo_mt).strip().lower()
-                    if codigo_key not in mantenimientos_por_maquina:
-                        mantenimientos_por_maquina[codigo_key] = []
-                    
-                    # Transformar datos de MongoDB
-                    if "_id" in mant:
-                        mant["_id"] = str(mant["_id"])
-                    if "tipo" not in mant:
-                        mant["tipo"] = "N/A"
-                    
-                    mantenimientos_por_maquina[codigo_key].append(mant)
-            
-            # Crear DTOs combinando datos de ambas bases
-            resultado = []
-            for maquina in maquinas:
-                codigo_maq = str(maquina.get("codigo", "")).strip().lower()
-                mantenimientos = mantenimientos_por_maquina.get(codigo_maq, [])
-                
-                # Extraer información adicional de mantenimientos
-                total_mantenimientos = len(mantenimientos)
-                ultimo_mantenimiento = None
-                if mantenimientos:
-                    # Ordenar por fecha para obtener el más reciente
-                    mantenimientos_ordenados = sorted(mantenimientos, 
-                                                   key=lambda x: x.get('fecha', ''), 
-                                                   reverse=True)
-                    ultimo_mantenimiento = mantenimientos_ordenados[0].get('fecha')
-                
-                # Crear diccionario directamente en lugar de usar DTO
-                maquina_dict = {
-                    "codigo": maquina["codigo"],
-                    "tipo": maquina["tipo"],
-                    "area": maquina["area"],
-                    "estado": maquina["estado"],
-                    "fecha_registro": maquina.get("fecha"),  # Datos de MySQL
-                    "mantenimientos": mantenimientos,       # Datos de MongoDB
-                    "total_mantenimientos": total_mantenimientos,
-                    "ultimo_mantenimiento": ultimo_mantenimiento
-                }
-                
-                resultado.append(maquina_dict)
+            if incluir_mantenimientos:
+                mantenimientos_por_maquina = mantenimiento_dao.listar_por_maquinas(codigos)
             
-            return resultado
-            
-        except Exception as e:
-            # En caso de cualquier error, devolver una lista vacía en lugar de lanzar excepción
-            return []
\ No newline at end of file
+            for maquina, codigo_maq in zip(bloque, codigos):
+                yield cls._combinar(maquina, resumen.get(codigo_maq, {}), mantenimientos_por_maquina.get(codigo_maq, []))
+
+    @staticmethod
+    def _combinar(maquina: dict, resumen_maquina: dict, mantenimientos: list) -> dict:
+        # Une la fila de MySQL con el resumen y los mantenimientos de MongoDB
+        # Transformar datos de MongoDB (el ObjectId de "_id" lo convierte el serializador de la respuesta)
+        for mant in mantenimientos:
+            if "tipo" not in mant:
+                mant["tipo"] = "N/A"
+        
+        # Crear diccionario directamente en lugar de usar DTO
+        return {
+            "codigo": maquina["codigo"],
+            "tipo": maquina["tipo"],
+            "area": maquina["area"],
+            "estado": maquina["estado"],
+            "fecha_registro": maquina.get("fecha"),  # Datos de MySQL
+            "mantenimientos": mantenimientos,       # Datos de MongoDB (solo si se piden)
+            "total_mantenimientos": resumen_maquina.get("total", 0),
+            "ultimo_mantenimiento": resumen_maquina.get("ultimo")
+        }
@@ -23,13 +23,18 @@ class RegisterRequest(BaseModel):
 async def login(datos: LoginRequest):
     # Inicia sesión de usuario
     try:
-        resultado, error = service.autenticar_usuario(datos.username, datos.password)
+        # El service toma un hilo de BD solo para la consulta; bcrypt se espera sin ocuparlo
+        resultado, error = await service.autenticar_usuario(datos.username, datos.password)
         if error:
             raise HTTPException(status_code=401, detail=error)
         return resultado
     except HTTPException:
         # Dejar pasar las excepciones HTTP (como 401)
         raise
+    except TimeoutError:
+        # bcrypt saturado por una ráfaga: el cliente puede reintentar en unos segundos
+        raise HTTPException(status_code=503, detail="Servicio saturado, reintente en unos segundos",
+                            headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -37,13 +42,17 @@ async def login(datos: LoginRequest):
 async def register(datos: RegisterRequest):
     # Registra un nuevo usuario
     try:
-        resultado, error = service.registrar_usuario(datos.model_dump())
+        resultado, error = await service.registrar_usuario(datos.model_dump())
         if error:
             raise HTTPException(status_code=400, detail=error)
         return resultado
     except HTTPException:
         # Dejar pasar las excepciones HTTP (como 400)
         raise
+    except TimeoutError:
+        # bcrypt saturado por una ráfaga: el cliente puede reintentar en unos segundos
+        raise HTTPException(status_code=503, detail="Servicio saturado, reintente en unos segundos",
+                            headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,9 +1,14 @@
 # ROUTES LIMPIAS - Solo validación HTTP y respuestas
 # Responsabilidades: validación de entrada, respuestas HTTP, coordinación con services
 
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 from app.services.mantenimiento_service import MantenimientoService
+from app.utils.concurrencia import Concurrencia
+from app.utils.lotes import LectorLotes
+from app.utils.streaming import RespuestaStreaming
+from app.utils.serializacion import RespuestaJSON
+from app.utils.etag import ETag
 
 router = APIRouter(prefix="/api/mantenimiento")
 service = MantenimientoService()
@@ -22,34 +27,60 @@ class MantenimientoRequest(BaseModel):
 async def agregar_mantenimiento(datos: MantenimientoRequest):
     # Registra un nuevo mantenimiento
     try:
-        resultado, error = service.registrar_mantenimiento(datos.model_dump())
+        resultado, error = await Concurrencia.ejecutar(service.registrar_mantenimiento, datos.model_dump())
         if error:
             raise HTTPException(status_code=404 if "no existe" in error else 400, detail=error)
         return resultado
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/agregar-lote")
+async def agregar_lote(request: Request, tamano_bloque: int = Query(None, ge=1, le=10000)):
+    # Agrega varios mantenimientos: JSON (array), NDJSON o CSV, en el cuerpo o como archivo "archivo"
+    try:
+        filas = await LectorLotes.leer(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        resultado, error = await Concurrencia.ejecutar(service.registrar_lote, filas, tamano_bloque)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        return resultado
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/listar/{codigo}")
-async def listar_mantenimientos_equipo(codigo: str, response: Response):
+async def listar_mantenimientos_equipo(codigo: str, request: Request):
     # Obtiene el historial de mantenimientos de una máquina
-    # Headers para evitar caché
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    
+    # Se puede guardar pero siempre se revalida: con If-None-Match vigente responde 304 sin ir a las bases
     try:
-        resultado, error = service.obtener_historial(codigo)
+        etag = await Concurrencia.ejecutar(service.etag_historial, codigo)
+        if ETag.coincide(request, etag):
+            return ETag.no_modificado(etag)
+        resultado, error = await Concurrencia.ejecutar(service.obtener_historial, codigo)
         if error:
             raise HTTPException(status_code=404, detail=error)
-        return resultado
+        return RespuestaJSON(resultado, headers=ETag.cabeceras(etag))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/informe-general")
-async def informe_general(codigo: str = None):
-    # Genera informe general de mantenimientos
+async def informe_general(request: Request, codigo: str = None, incluir_mantenimientos: bool = False,
+                          stream: bool = False):
+    # Genera informe general de mantenimientos (las listas completas solo con incluir_mantenimientos=true)
+    # Con "Accept: application/x-ndjson" o stream=1 envía una máquina por línea a medida que se lee
+    if RespuestaStreaming.solicitado(request, stream):
+        return RespuestaStreaming.ndjson(service.iterar_informe_general(codigo, incluir_mantenimientos))
     try:
-        resultado, error = service.generar_informe_general(codigo)
+        etag = await Concurrencia.ejecutar(service.etag_informe)
+        if ETag.coincide(request, etag):
+            return ETag.no_modificado(etag)
+        resultado, error = await Concurrencia.ejecutar(service.generar_informe_general, codigo, incluir_mantenimientos)
         if error:
             raise HTTPException(status_code=500, detail=error)
-        return resultado
+        return RespuestaJSON(resultado, headers=ETag.cabeceras(etag))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
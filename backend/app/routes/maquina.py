@@ -1,9 +1,14 @@
 # ROUTES LIMPIAS - Solo validación HTTP y respuestas
 # Responsabilidades: validación de entrada, respuestas HTTP, coordinación con services
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel
 from app.services.maquina_service import MaquinaService
+from app.utils.concurrencia import Concurrencia
+from app.utils.lotes import LectorLotes
+from app.utils.streaming import RespuestaStreaming
+from app.utils.serializacion import RespuestaJSON, RespuestaJSONSerializada
+from app.utils.etag import ETag
 
 router = APIRouter(prefix="/api/maquinas")
 service = MaquinaService()
@@ -21,18 +26,36 @@ class MaquinaRequest(BaseModel):
 async def agregar_maquina(datos: MaquinaRequest):
     # Agrega una nueva máquina
     try:
-        resultado, error = service.registrar_maquina(datos.model_dump())
+        resultado, error = await Concurrencia.ejecutar(service.registrar_maquina, datos.model_dump())
         if error:
             raise HTTPException(status_code=400, detail=error)
         return resultado
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/agregar-lote")
+async def agregar_lote(request: Request):
+    # Agrega varias máquinas: JSON (array), NDJSON o CSV, en el cuerpo o como archivo "archivo"
+    try:
+        filas = await LectorLotes.leer(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        resultado, error = await Concurrencia.ejecutar(service.registrar_lote, filas)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        return resultado
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.put("/actualizar")
 async def actualizar_maquina(datos: MaquinaRequest):
     # Actualiza una máquina existente
     try:
-        resultado, error = service.actualizar_maquina(datos.model_dump())
+        resultado, error = await Concurrencia.ejecutar(service.actualizar_maquina, datos.model_dump())
         if error:
             raise HTTPException(status_code=404 if "no existe" in error else 400, detail=error)
         return resultado
@@ -43,7 +66,7 @@ async def actualizar_maquina(datos: MaquinaRequest):
 async def eliminar_maquina(codigo: str):
     # Elimina una máquina y sus mantenimientos
     try:
-        exito, mensaje = service.eliminar_maquina(codigo)
+        exito, mensaje = await Concurrencia.ejecutar(service.eliminar_maquina, codigo)
         if not exito:
             raise HTTPException(status_code=404, detail=mensaje)
         return {"mensaje": mensaje}
@@ -51,19 +74,45 @@ async def eliminar_maquina(codigo: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/listar")
-async def listar_maquinas():
-    # Lista todas las máquinas
+async def listar_maquinas(request: Request, limit: int = Query(None, ge=1, le=500), after_codigo: str = None,
+                          tipo: str = None, estado: str = None, area: str = None, total: bool = False,
+                          stream: bool = False):
+    # Lista todas las máquinas (sin parámetros devuelve la lista completa cacheada)
+    # Con limit o filtros devuelve una página: {"items", "siguiente", "total"}
+    # Con "Accept: application/x-ndjson" o stream=1 envía todas las que cumplen los filtros, una por línea
+    # Con If-None-Match y la versión vigente responde 304 sin consultar las bases
+    if RespuestaStreaming.solicitado(request, stream):
+        return RespuestaStreaming.ndjson(service.iterar_maquinas(None, tipo, estado, area))
     try:
-        maquinas = service.buscar_maquinas()
-        return maquinas
+        etag = await Concurrencia.ejecutar(service.etag_listado)
+        if ETag.coincide(request, etag):
+            return ETag.no_modificado(etag)
+        if limit is None and not any([after_codigo, tipo, estado, area, total]):
+            # Listado completo ya serializado (desde Redis se envía sin decodificar)
+            contenido = await Concurrencia.ejecutar(service.listar_maquinas_json)
+            return RespuestaJSONSerializada(contenido, headers=ETag.cabeceras(etag))
+        return RespuestaJSON(await Concurrencia.ejecutar(
+            service.buscar_paginado, None, tipo, estado, area, limit or 50, after_codigo, total
+        ), headers=ETag.cabeceras(etag))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/buscar")
-async def buscar_maquinas(termino: str = None):
-    # Busca máquinas por término parcial
+async def buscar_maquinas(request: Request, termino: str = None, limit: int = Query(50, ge=1, le=500),
+                          after_codigo: str = None, tipo: str = None, estado: str = None, area: str = None,
+                          total: bool = False):
+    # Busca máquinas por término parcial y filtros, paginando con after_codigo
     try:
-        maquinas = service.buscar_maquinas(termino)
-        return maquinas
+        etag = await Concurrencia.ejecutar(service.etag_listado)
+        if ETag.coincide(request, etag):
+            return ETag.no_modificado(etag)
+        return RespuestaJSON(await Concurrencia.ejecutar(
+            service.buscar_paginado, termino, tipo, estado, area, limit, after_codigo, total
+        ), headers=ETag.cabeceras(etag))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/estadisticas")
+async def estadisticas_cache():
+    # Aciertos y fallos de la caché L1 del proceso y de Redis
+    return service.estadisticas_cache()
@@ -0,0 +1,41 @@
+# ROUTES LIMPIAS - Solo validación HTTP y respuestas
+# Responsabilidades: estado interno del proceso (pools y cachés) y salud para monitoreo
+
+import os
+from fastapi import APIRouter, Response
+from app.services.salud_service import SaludService
+from app.utils.serializacion import RespuestaJSON
+from app.database.mysql import MySQLConnection
+from app.services.maquina_service import MaquinaService
+from app.utils.hash_executor import HashExecutor
+from app.utils.metricas import Metricas
+
+router = APIRouter(prefix="/api/sistema")
+# Rutas sin prefijo (Prometheus busca /metrics por defecto)
+router_raiz = APIRouter()
+
+@router.get("/estadisticas")
+async def estadisticas():
+    # Uso del pool MySQL, del pool de bcrypt y de las cachés de este proceso (cada worker tiene los suyos)
+    return {
+        "worker": os.getpid(),
+        "mysql_pool": MySQLConnection.estadisticas(),
+        "bcrypt": HashExecutor.estadisticas(),
+        "cache": MaquinaService().estadisticas_cache()
+    }
+
+@router_raiz.get("/health", include_in_schema=False)
+@router.get("/health")
+async def salud():
+    # Ping a MySQL, MongoDB y Redis (lo consultan el monitor del dashboard y el healthcheck de Docker)
+    # 503 solo si no responde ninguna: con alguna caída el backend sigue atendiendo en modo degradado
+    resultado = await SaludService.verificar()
+    codigo = 503 if resultado["estado"] == "caido" else 200
+    return RespuestaJSON(resultado, status_code=codigo, headers={"Cache-Control": "no-store"})
+
+@router_raiz.get("/metrics", include_in_schema=False)
+@router.get("/metrics")
+async def metricas():
+    # Métricas en formato de exposición de Prometheus
+    contenido, tipo = Metricas.exportar()
+    return Response(content=contenido, media_type=tipo)
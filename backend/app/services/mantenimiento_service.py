@@ -1,15 +1,30 @@
 # SERVICE - Toda la lógica de negocio de mantenimientos
 # Responsabilidades: validación, transformación, normalización, lógica de negocio
 
+import os
+import time
+import logging
 from app.daos.mantenimiento_dao import MantenimientoDAO
 from app.daos.maquina_dao import MaquinaDAO
+from app.daos.version_dao import VersionDAO
+from app.services.maquina_service import MaquinaService
 from app.models.Mantenimiento import Mantenimiento
 from app.dtos.informe_dto import InformeMaquinaDTO
+from app.utils.etag import ETag
+
+logger = logging.getLogger(__name__)
 
 class MantenimientoService:
+    # Límites de la carga masiva (configurables por entorno)
+    MAX_LOTE = int(os.getenv("MAX_LOTE_MANTENIMIENTOS", "50000"))
+    TAMANO_BLOQUE = int(os.getenv("TAMANO_BLOQUE_MANTENIMIENTOS", "1000"))
+    CAMPOS_OBLIGATORIOS = ["codigo_maquina", "empresa", "tecnico", "tipo", "fecha", "observaciones"]
+
     def __init__(self):
         self.dao = MantenimientoDAO()
         self.maquina_dao = MaquinaDAO()
+        self.maquina_service = MaquinaService()
+        self.versiones = VersionDAO()
 
     # Registra nuevo mantenimiento con validación completa
     def registrar_mantenimiento(self, datos: dict) -> tuple:
@@ -22,8 +37,7 @@ class MantenimientoService:
         codigo_maquina = datos["codigo_maquina"].strip()
         
         # Verificar que la máquina existe (case-insensitive)
-        maquina_service = __import__('app.services.maquina_service', fromlist=['MaquinaService']).MaquinaService()
-        maquina = maquina_service.obtener_por_codigo(codigo_maquina)
+        maquina = self.maquina_service.obtener_por_codigo(codigo_maquina)
         if not maquina:
             return None, f"La máquina '{codigo_maquina}' no existe"
 
@@ -54,6 +68,7 @@ class MantenimientoService:
                 datos["observaciones"].strip(),
                 datos.get("usuario", "").strip()
             ):
+                self._incrementar_versiones([codigo_maquina])
                 return {"mensaje": "Mantenimiento registrado", "codigo_maquina": codigo_maquina}, None
             else:
                 return None, "Error al guardar en base de datos"
@@ -61,13 +76,98 @@ class MantenimientoService:
         except ValueError as e:
             return None, str(e)
 
+    # Registra muchos mantenimientos de una vez (por ejemplo, la planilla anual de un proveedor)
+    # Valida cada fila, comprueba todas las máquinas en una consulta y guarda por bloques
+    # Devuelve el resultado de cada fila y estadísticas de rendimiento
+    def registrar_lote(self, filas: list, tamano_bloque: int = None) -> tuple:
+        if not filas:
+            return None, "El lote está vacío"
+        if len(filas) > self.MAX_LOTE:
+            return None, f"El lote supera el máximo de {self.MAX_LOTE} mantenimientos"
+        tamano_bloque = tamano_bloque or self.TAMANO_BLOQUE
+        inicio = time.perf_counter()
+
+        resultados = []
+        validas = []  # (resultado, documento)
+
+        # 1️⃣ Validación y normalización de cada fila
+        for numero, datos in enumerate(filas, start=1):
+            resultado = {"fila": numero, "codigo_maquina": None, "estado": "error", "error": None}
+            resultados.append(resultado)
+            if not isinstance(datos, dict) or not all(datos.get(campo) for campo in self.CAMPOS_OBLIGATORIOS):
+                resultado["error"] = "Todos los campos son obligatorios"
+                continue
+
+            valores = {campo: str(datos[campo]).strip() for campo in self.CAMPOS_OBLIGATORIOS}
+            resultado["codigo_maquina"] = valores["codigo_maquina"]
+
+            tipo = valores["tipo"].lower()
+            if tipo not in ["preventivo", "correctivo"]:
+                resultado["error"] = "El tipo debe ser 'preventivo' o 'correctivo'"
+                continue
+
+            # Creación del objeto mantenimiento, igual que en el registro individual; el documento sale del modelo
+            try:
+                mantenimiento = Mantenimiento(
+                    maquina_objeto={"codigo": valores["codigo_maquina"]},
+                    empresa=valores["empresa"],
+                    tecnico=valores["tecnico"],
+                    tipo=tipo,
+                    fecha=valores["fecha"],
+                    observaciones=valores["observaciones"],
+                    usuario=str(datos.get("usuario") or "").strip()
+                )
+            except ValueError as e:
+                resultado["error"] = str(e)
+                continue
+            validas.append((resultado, mantenimiento.to_dict()))
+
+        # 2️⃣ Existencia de las máquinas referenciadas en una consulta por bloque (índice único)
+        if validas:
+            codigos = {self.dao.normalizar(documento["codigo_maquina"]) for _, documento in validas}
+            existentes = self.maquina_dao.buscar_codigos_existentes(list(codigos))
+            if existentes is None:
+                return None, "Error al verificar las máquinas en base de datos"
+            pendientes = []
+            for resultado, documento in validas:
+                if self.dao.normalizar(documento["codigo_maquina"]) in existentes:
+                    pendientes.append((resultado, documento))
+                else:
+                    resultado["error"] = f"La máquina '{documento['codigo_maquina']}' no existe"
+            validas = pendientes
+
+        # 3️⃣ Inserción por bloques sin orden; los fallos se informan por fila
+        if validas:
+            fallidos = set(self.dao.insertar_lote([documento for _, documento in validas], tamano_bloque))
+            afectadas = set()
+            for posicion, (resultado, documento) in enumerate(validas):
+                if posicion in fallidos:
+                    resultado["error"] = "Error al guardar en base de datos"
+                else:
+                    resultado["estado"] = "insertado"
+                    afectadas.add(self.dao.normalizar(documento["codigo_maquina"]))
+            # Solo cambian los ETags si algo se guardó (y solo los de las máquinas con inserciones)
+            if afectadas:
+                self._incrementar_versiones(afectadas)
+
+        segundos = time.perf_counter() - inicio
+        insertados = sum(1 for resultado in resultados if resultado["estado"] == "insertado")
+        return {
+            "mensaje": f"{insertados} de {len(filas)} mantenimientos registrados",
+            "filas": len(filas),
+            "insertados": insertados,
+            "errores": len(filas) - insertados,
+            "segundos": round(segundos, 3),
+            "filas_por_segundo": round(len(filas) / segundos, 1) if segundos > 0 else None,
+            "resultados": resultados
+        }, None
+
     # Obtiene historial de mantenimientos de una máquina (ordenado por fecha)
     def obtener_historial(self, codigo_maquina: str) -> tuple:
         codigo_normalizado = codigo_maquina.strip()
         
         # Verificar que la máquina existe
-        maquina_service = __import__('app.services.maquina_service', fromlist=['MaquinaService']).MaquinaService()
-        maquina = maquina_service.obtener_por_codigo(codigo_normalizado)
+        maquina = self.maquina_service.obtener_por_codigo(codigo_normalizado)
         if not maquina:
             return None, f"La máquina '{codigo_normalizado}' no existe"
 
@@ -76,11 +176,8 @@ class MantenimientoService:
         
         # Transformación de datos para el frontend
         resultado = []
+        # El ObjectId de "_id" lo convierte el serializador de la respuesta
         for mant in mantenimientos:
-            # Convertir ObjectId a string
-            if "_id" in mant:
-                mant["_id"] = str(mant["_id"])
-            
             # Asegurar que tenga todos los campos esperados
             if "tipo" not in mant:
                 mant["tipo"] = "N/A"
@@ -90,25 +187,55 @@ class MantenimientoService:
         return resultado, None
 
     # Genera informe general delegando al DTO
-    def generar_informe_general(self, codigo_filtro: str = None) -> tuple:
+    def generar_informe_general(self, codigo_filtro: str = None, incluir_mantenimientos: bool = False) -> tuple:
         # El service solo coordina, el DTO obtiene los datos de MySQL + MongoDB
         try:
             # El DTO mismo obtiene y combina los datos de ambas bases
-            resultado = InformeMaquinaDTO.crear_reporte_general(codigo_filtro)
+            resultado = InformeMaquinaDTO.crear_reporte_general(codigo_filtro, incluir_mantenimientos)
             return resultado, None
         except Exception as e:
             return None, f"Error al generar informe: {str(e)}"
 
+    # Genera el informe general fila por fila (para respuestas en streaming)
+    def iterar_informe_general(self, codigo_filtro: str = None, incluir_mantenimientos: bool = False):
+        return InformeMaquinaDTO.iterar_reporte_general(codigo_filtro, incluir_mantenimientos)
+
     # Elimina mantenimientos de una máquina
     def eliminar_por_maquina(self, codigo_maquina: str) -> tuple:
         codigo_normalizado = codigo_maquina.strip()
         
         # Verificar que la máquina existe
-        maquina_service = __import__('app.services.maquina_service', fromlist=['MaquinaService']).MaquinaService()
-        maquina = maquina_service.obtener_por_codigo(codigo_normalizado)
+        maquina = self.maquina_service.obtener_por_codigo(codigo_normalizado)
         if not maquina:
             return 0, f"La máquina '{codigo_normalizado}' no existe"
 
         # Eliminar mantenimientos
         eliminados = self.dao.eliminar_por_maquina(codigo_normalizado)
+        if eliminados:
+            self._incrementar_versiones([codigo_normalizado])
         return eliminados, None
+
+    # Sube la versión de la colección y de cada máquina afectada (cambia el ETag del historial e informe)
+    def _incrementar_versiones(self, codigos):
+        try:
+            self.versiones.incrementar(VersionDAO.MANTENIMIENTOS, *[VersionDAO.maquina(codigo) for codigo in codigos])
+        except Exception as redis_error:
+            logger.warning("No se pudo incrementar la versión: %s", redis_error)
+
+    # ETag del historial de una máquina (cambia con la máquina y con sus mantenimientos)
+    def etag_historial(self, codigo_maquina: str) -> str:
+        try:
+            epoca, version = self.versiones.obtener(VersionDAO.maquina(codigo_maquina))
+        except Exception as redis_error:
+            logger.warning("Error leyendo versión: %s", redis_error)
+            return None
+        return ETag.construir("h", epoca, version)
+
+    # ETag del informe general (depende de ambas colecciones)
+    def etag_informe(self) -> str:
+        try:
+            epoca, maquinas, mantenimientos = self.versiones.obtener(VersionDAO.MAQUINAS, VersionDAO.MANTENIMIENTOS)
+        except Exception as redis_error:
+            logger.warning("Error leyendo versión: %s", redis_error)
+            return None
+        return ETag.construir("i", epoca, maquinas, mantenimientos)
@@ -1,15 +1,113 @@
 # SERVICE - Toda la lógica de negocio de máquinas
 # Responsabilidades: validación, transformación, normalización, lógica de negocio
 
-import json
-from app.database.redis_client import redis_client
+import os
+import time
+import logging
+from datetime import datetime
 from app.daos.maquina_dao import MaquinaDAO
+from app.daos.maquina_cache_dao import MaquinaCacheDAO
+from app.daos.version_dao import VersionDAO
+from app.utils.single_flight import SingleFlight
+from app.utils.cache_local import CacheLocal, ContadorCache
+from app.utils.serializacion import Serializador
+from app.utils.etag import ETag
 from app.models.Computadora import Computadora
 from app.models.Impresora import Impresora
 
+logger = logging.getLogger(__name__)
+
 class MaquinaService:
+    # Cargas en curso compartidas por todas las instancias del proceso
+    _vuelos = SingleFlight()
+    # Segundos que se espera a que otro backend reconstruya el índice antes de ir a MySQL
+    ESPERA_RECONSTRUCCION = 2.0
+    # Máximo de máquinas por lote y filas por INSERT multi-fila
+    MAX_LOTE = int(os.getenv("MAX_LOTE_MAQUINAS", "5000"))
+    TAMANO_BLOQUE = int(os.getenv("TAMANO_BLOQUE_MAQUINAS", "500"))
+    # Longitud máxima de las columnas de texto de la tabla maquinas (una fila más larga haría fallar el lote entero)
+    LONGITUDES = {"codigo_equipo": 50, "estado_actual": 50, "area": 100, "usuario": 50}
+    # Caché L1 del proceso: máquinas individuales y listado completo
+    _l1 = CacheLocal(int(os.getenv("L1_CACHE_SIZE", "10000")), float(os.getenv("L1_CACHE_TTL", "5")))
+    # Aciertos/fallos del nivel Redis
+    _contador_redis = ContadorCache("redis")
+    # Hilo que escucha las invalidaciones de otros backends
+    _suscripcion = None
+    # Último ETag del listado visto por este proceso
+    _etag_listado = None
+
     def __init__(self):
         self.dao = MaquinaDAO()
+        self.cache = MaquinaCacheDAO()
+        self.versiones = VersionDAO()
+
+    # Arranca la escucha de invalidaciones por pub/sub (se llama en el startup)
+    @classmethod
+    def iniciar_invalidaciones(cls):
+        if cls._suscripcion is None:
+            try:
+                cls._suscripcion = MaquinaCacheDAO().suscribir_invalidaciones(cls._invalidar_local)
+            except Exception as redis_error:
+                logger.warning("No se pudo suscribir a invalidaciones: %s", redis_error)
+
+    # Detiene la escucha de invalidaciones (se llama en el shutdown)
+    @classmethod
+    def detener_invalidaciones(cls):
+        if cls._suscripcion is not None:
+            cls._suscripcion.stop()
+            cls._suscripcion = None
+
+    # Descarta de la L1 una máquina y el listado; sin código se descarta todo
+    @classmethod
+    def _invalidar_local(cls, codigo_normalizado: str = None):
+        if codigo_normalizado:
+            cls._l1.invalidar(f"maquina:{codigo_normalizado}", "maquinas:listar", "maquinas:listar:json")
+        else:
+            cls._l1.limpiar()
+
+    # Invalida la L1 propia y la de los demás backends tras una escritura
+    # Con "lote" el aviso y las versiones se encolan junto a la escritura del índice (un solo viaje a Redis)
+    def _invalidar(self, codigo: str, lote=None):
+        self._invalidar_local(codigo.strip().lower())
+        if lote is not None:
+            self.cache.publicar_invalidacion(codigo, lote)
+            self.versiones.incrementar(VersionDAO.MAQUINAS, VersionDAO.maquina(codigo), lote=lote)
+            return
+        try:
+            self.cache.publicar_invalidacion(codigo)
+        except Exception as redis_error:
+            logger.warning("No se pudo publicar invalidación: %s", redis_error)
+        self._incrementar_versiones([codigo])
+
+    # Sube la versión de la colección y de cada máquina escrita (cambia el ETag de los listados)
+    # Se llama después de actualizar MySQL y el índice Redis
+    def _incrementar_versiones(self, codigos: list):
+        try:
+            self.versiones.incrementar(VersionDAO.MAQUINAS, *[VersionDAO.maquina(codigo) for codigo in codigos])
+        except Exception as redis_error:
+            logger.warning("No se pudo incrementar la versión: %s", redis_error)
+
+    # ETag de los listados de máquinas; None si Redis no está disponible
+    def etag_listado(self) -> str:
+        try:
+            epoca, version = self.versiones.obtener(VersionDAO.MAQUINAS)
+        except Exception as redis_error:
+            logger.warning("Error leyendo versión: %s", redis_error)
+            return None
+        etag = ETag.construir("m", epoca, version)
+        # Si la versión cambió, la L1 puede estar atrasada (la invalidación por pub/sub aún no llegó)
+        if etag != MaquinaService._etag_listado:
+            self._l1.invalidar("maquinas:listar", "maquinas:listar:json")
+            MaquinaService._etag_listado = etag
+        return etag
+
+    # Aciertos y fallos de cada nivel de caché
+    def estadisticas_cache(self) -> dict:
+        return {"l1": self._l1.estadisticas(), "redis": self._contador_redis.estadisticas()}
+
+    @classmethod
+    def estadisticas_l1(cls) -> dict:
+        return cls._l1.estadisticas()
 
     # Registra nueva máquina con validación completa y resiliencia Redis
     def registrar_maquina(self, datos: dict) -> tuple:
@@ -34,14 +132,7 @@ class MaquinaService:
 
         try:
             # Creación del objeto usando Factory Pattern
-            if tipo == "PC":
-                maquina = Computadora(codigo, datos["estado_actual"], 
-                                    datos["area"], datos["fecha"], 
-                                    datos.get("usuario"))
-            else:  # IMP
-                maquina = Impresora(codigo, datos["estado_actual"], 
-                                   datos["area"], datos["fecha"], 
-                                   datos.get("usuario"))
+            maquina = self._crear_maquina(codigo, tipo, datos)
 
             # Preparar datos para Redis (consistentes con DB)
             datos_maquina = {
@@ -68,40 +159,38 @@ class MaquinaService:
                     maquina.usuario
                 )
             except Exception as db_error:
-                print(f"⚠️ Error DB: {str(db_error)}")
+                logger.warning("Error DB: %s", db_error)
                 db_exitoso = False
 
             # 2️⃣ Siempre intentar guardar en Redis (incluso si DB falla)
             try:
-                # Guardar máquina individual en Redis
-                redis_client.setex(
-                    f"siglab:maquina:{codigo.lower()}",
-                    3600,  # 1 hora TTL para máquinas individuales
-                    json.dumps(datos_maquina)
-                )
-                
-                # Actualizar lista completa en Redis
-                self._actualizar_cache_redis_con_nueva_maquina(datos_maquina)
+                # Índice (HSET, O(1)), aviso a las L1 de todos los backends y versiones
+                # en una sola transacción MULTI/EXEC: un viaje de red
+                lote = self.cache.lote()
+                # La L1 propia se descarta antes, aunque Redis falle (MULTI/EXEC aplica todo junto)
+                self._invalidar(codigo, lote)
+                self.cache.guardar(datos_maquina, lote)
+                lote.ejecutar()
                 redis_exitoso = True
                 
             except Exception as redis_error:
-                print(f"⚠️ Error Redis: {str(redis_error)}")
+                logger.warning("Error Redis: %s", redis_error)
                 redis_exitoso = False
 
             # 3️⃣ Lógica de resiliencia y respuesta
             if db_exitoso and redis_exitoso:
                 # ✅ Éxito completo
-                print("✅ Máquina guardada en DB y Redis")
+                logger.debug("Máquina guardada en DB y Redis", extra={"codigo": codigo})
                 return {"mensaje": "Máquina registrada (DB + Redis)", "codigo": codigo}, None
                 
             elif db_exitoso and not redis_exitoso:
                 # ⚠️ Solo DB (Redis caído)
-                print("⚠️ Máquina guardada solo en DB (Redis no disponible)")
+                logger.warning("Máquina guardada solo en DB (Redis no disponible)", extra={"codigo": codigo})
                 return {"mensaje": "Máquina registrada (solo DB)", "codigo": codigo}, None
                 
             elif not db_exitoso and redis_exitoso:
                 # 🔄 Solo Redis (DB caída) - Modo resiliencia
-                print("🔄 Máquina guardada solo en Redis (DB no disponible)")
+                logger.warning("Máquina guardada solo en Redis (DB no disponible)", extra={"codigo": codigo})
                 return {"mensaje": "Máquina registrada (solo Redis - modo resiliencia)", "codigo": codigo}, None
                 
             else:
@@ -111,6 +200,129 @@ class MaquinaService:
         except ValueError as e:
             return None, str(e)
 
+    # Registra un lote de máquinas: validación por fila, duplicados en una consulta,
+    # inserción multi-fila en una transacción y caché Redis en un solo pipeline
+    def registrar_lote(self, filas: list) -> tuple:
+        if not filas:
+            return None, "El lote está vacío"
+        if len(filas) > self.MAX_LOTE:
+            return None, f"El lote supera el máximo de {self.MAX_LOTE} máquinas"
+
+        resultados = []
+        validas = []  # (índice en resultados, máquina)
+        vistos = set()
+
+        # 1️⃣ Validación de cada fila con el Factory Pattern
+        for numero, datos in enumerate(filas, start=1):
+            resultado = {"fila": numero, "codigo": None, "estado": "error", "error": None}
+            resultados.append(resultado)
+            try:
+                if not isinstance(datos, dict) or not all([datos.get("codigo_equipo"), datos.get("tipo_equipo"),
+                           datos.get("estado_actual"), datos.get("area"), datos.get("fecha")]):
+                    resultado["error"] = "Todos los campos son obligatorios"
+                    continue
+
+                codigo = str(datos["codigo_equipo"]).strip()
+                resultado["codigo"] = codigo
+                tipo = str(datos["tipo_equipo"]).strip().upper()
+                if tipo not in ["PC", "IMP"]:
+                    resultado["error"] = "Tipo de equipo no válido (debe ser PC o IMP)"
+                    continue
+
+                # Duplicados dentro del mismo lote
+                if codigo.lower() in vistos:
+                    resultado["error"] = f"El código '{codigo}' está repetido en el lote"
+                    continue
+                vistos.add(codigo.lower())
+
+                datos = self._validar_fila(datos)
+                maquina = self._crear_maquina(codigo, tipo, datos)
+                maquina.validar_datos()
+                validas.append((resultado, maquina))
+            except (ValueError, TypeError, AttributeError) as e:
+                resultado["error"] = str(e)
+
+        # 2️⃣ Duplicados contra la base de datos en una consulta por bloque (índice único)
+        if validas:
+            existentes = self.dao.buscar_codigos_existentes([m.codigo_equipo.lower() for _, m in validas])
+            if existentes is None:
+                return None, "Error al verificar duplicados en base de datos"
+            pendientes = []
+            for resultado, maquina in validas:
+                if maquina.codigo_equipo.lower() in existentes:
+                    resultado["error"] = f"El código '{maquina.codigo_equipo}' ya existe"
+                else:
+                    pendientes.append((resultado, maquina))
+            validas = pendientes
+
+        # 3️⃣ Inserción en una sola transacción
+        if validas:
+            guardado = self.dao.insertar_lote(
+                [(m.codigo_equipo, m.tipo_equipo, m.estado_actual, m.area, m.fecha, m.usuario) for _, m in validas],
+                self.TAMANO_BLOQUE
+            )
+            if not guardado:
+                for resultado, _ in validas:
+                    resultado["error"] = "Error al guardar en base de datos"
+                validas = []
+
+        # 4️⃣ Caché Redis en un pipeline e invalidación de las L1
+        if validas:
+            for resultado, _ in validas:
+                resultado["estado"] = "insertada"
+            # Índice, aviso y versiones en un viaje; sin transacción para no bloquear Redis con un lote de miles de filas
+            self._l1.limpiar()
+            try:
+                lote = self.cache.lote(transaccion=False)
+                self.cache.guardar_lote([{
+                    "codigo": m.codigo_equipo,
+                    "tipo": m.tipo_equipo,
+                    "estado": m.estado_actual,
+                    "area": m.area,
+                    "fecha": m.fecha,
+                    "usuario": m.usuario or ""
+                } for _, m in validas], lote)
+                self.cache.publicar_invalidacion(lote=lote)
+                self.versiones.incrementar(
+                    VersionDAO.MAQUINAS, *[VersionDAO.maquina(m.codigo_equipo) for _, m in validas], lote=lote
+                )
+                lote.ejecutar()
+            except Exception as redis_error:
+                logger.warning("Error Redis: %s", redis_error)
+
+        insertadas = len(validas)
+        return {
+            "mensaje": f"{insertadas} de {len(filas)} máquinas registradas",
+            "insertadas": insertadas,
+            "errores": len(filas) - insertadas,
+            "resultados": resultados
+        }, None
+
+    # Valida lo que MySQL rechazaría al insertar (fecha y longitudes) para que solo falle la fila con el error
+    # Devuelve los datos con la fecha en formato AAAA-MM-DD; lanza ValueError si algo no es válido
+    def _validar_fila(self, datos: dict) -> dict:
+        for campo, maximo in self.LONGITUDES.items():
+            valor = datos.get(campo)
+            if valor is not None and len(str(valor)) > maximo:
+                raise ValueError(f"El campo '{campo}' supera los {maximo} caracteres")
+        try:
+            fecha = datetime.fromisoformat(str(datos["fecha"]).strip()).date()
+        except ValueError:
+            raise ValueError(f"Fecha no válida: '{datos['fecha']}' (formato AAAA-MM-DD)")
+        return {**datos, "fecha": fecha.isoformat()}
+
+    # Crea el objeto máquina usando Factory Pattern según el tipo normalizado
+    @staticmethod
+    def _crear_maquina(codigo: str, tipo: str, datos: dict):
+        if tipo == "PC":
+            return Computadora(codigo, datos["estado_actual"], 
+                               datos["area"], datos["fecha"], 
+                               datos.get("usuario"))
+        # IMP
+        return Impresora(codigo, datos["estado_actual"], 
+                         datos["area"], datos["fecha"], 
+                         datos.get("usuario"))
+
     # Actualiza máquina existente
     def actualizar_maquina(self, datos: dict) -> tuple:
         if not datos.get("codigo_equipo"):
@@ -134,15 +346,31 @@ class MaquinaService:
         tipo_normalizado = "PC" if tipo in ["PC", "COMPUTADORA"] else "IMP"
 
         # Actualización
+        datos_maquina = {
+            "codigo": maquina_existente["codigo"],
+            "tipo": tipo_normalizado,
+            "estado": datos.get("estado_actual") or maquina_existente.get("estado"),
+            "area": datos.get("area") or maquina_existente.get("area"),
+            "fecha": self._fecha_a_texto(datos.get("fecha") or maquina_existente.get("fecha")),
+            "usuario": datos.get("usuario") or maquina_existente.get("usuario")
+        }
         if self.dao.actualizar(
             codigo,
-            tipo_normalizado,
-            datos.get("estado_actual") or maquina_existente.get("estado"),
-            datos.get("area") or maquina_existente.get("area"),
-            datos.get("fecha") or maquina_existente.get("fecha"),
-            datos.get("usuario") or maquina_existente.get("usuario")
+            datos_maquina["tipo"],
+            datos_maquina["estado"],
+            datos_maquina["area"],
+            datos_maquina["fecha"],
+            datos_maquina["usuario"]
         ):
-            redis_client.delete("siglab:maquinas:listar")
+            # Reemplazar la entrada del índice, avisar a las L1 y subir versiones en un solo viaje
+            try:
+                lote = self.cache.lote()
+                # La L1 propia se descarta antes, aunque Redis falle (MULTI/EXEC aplica todo junto)
+                self._invalidar(codigo, lote)
+                self.cache.guardar(datos_maquina, lote)
+                lote.ejecutar()
+            except Exception as redis_error:
+                logger.warning("Error actualizando Redis: %s", redis_error)
             return {"mensaje": "Máquina actualizada", "codigo": codigo}, None
         else:
             return None, "Error al actualizar la máquina"
@@ -157,159 +385,220 @@ class MaquinaService:
 
         # Eliminar (los mantenimientos se eliminan por cascade o en otro servicio)
         if self.dao.eliminar(codigo):
-            redis_client.delete("siglab:maquinas:listar")
+            # Quitar del índice, avisar a las L1 y subir versiones en un solo viaje
+            try:
+                lote = self.cache.lote()
+                # La L1 propia se descarta antes, aunque Redis falle (MULTI/EXEC aplica todo junto)
+                self._invalidar(codigo, lote)
+                self.cache.eliminar(codigo, lote)
+                lote.ejecutar()
+            except Exception as redis_error:
+                logger.warning("Error eliminando de Redis: %s", redis_error)
             return True, "Máquina eliminada correctamente"
         else:
             return False, "Error al eliminar la máquina"
 
     # Busca máquinas con lógica de búsqueda flexible y resiliencia Redis
     def buscar_maquinas(self, termino: str = None) -> list:
-        cache_key = "siglab:maquinas:listar"
-
         # SOLO cacheamos cuando es listado completo
         if not termino:
-            # 1 Revisar cache
-            maquinas_cache = redis_client.get(cache_key)
-
-            if maquinas_cache:
-                print("📦 Desde Redis")
-                return json.loads(maquinas_cache)
+            # 0 Revisar caché L1 del proceso
+            maquinas_l1 = self._l1.obtener("maquinas:listar")
+            if maquinas_l1 is not None:
+                return maquinas_l1
 
-            # 2️ Consultar base de datos con fallback a Redis
+            # 1 Revisar índice Redis (solo si está completo)
             try:
-                maquinas = self.dao.listar_todas()
-                print("🗄️ Desde MySQL")
-            except Exception as db_error:
-                print(f"⚠️ Error MySQL: {str(db_error)} - Intentando fallback Redis")
-                maquinas = self._obtener_maquinas_desde_redis_fallback()
-            
-            # 3️ Convertir fechas a string para JSON
-            for maquina in maquinas:
-                if 'fecha' in maquina and hasattr(maquina['fecha'], 'strftime'):
-                    maquina['fecha'] = maquina['fecha'].strftime('%Y-%m-%d')
-            
-            # 4️ Guardar en Redis con TTL (60 segundos)
-            try:
-                redis_client.setex(cache_key, 60, json.dumps(maquinas))
-                print("💾 Guardado en Redis")
+                maquinas_cache, edad = self.cache.listar_con_edad()
             except Exception as redis_error:
-                print(f"⚠️ No se pudo guardar en Redis: {str(redis_error)}")
-
+                logger.warning("Error leyendo Redis: %s", redis_error)
+                maquinas_cache, edad = None, None
+            self._contador_redis.registrar(maquinas_cache is not None, "maquinas:listar")
+
+            # Índice fresco (dentro del TTL suave)
+            if maquinas_cache is not None and edad is not None and edad < self.cache.TTL_SUAVE:
+                logger.debug("Listado desde Redis")
+                self._l1.guardar("maquinas:listar", maquinas_cache)
+                return maquinas_cache
+
+            # Índice vencido pero usable: si ya se está recargando en este proceso, servir el obsoleto
+            if maquinas_cache is not None and self._vuelos.en_curso("maquinas:listar"):
+                logger.debug("Listado desde Redis (obsoleto, recarga en curso)")
+                return maquinas_cache
+
+            # 2️ Una sola recarga por proceso; el resto de hilos espera su resultado
+            maquinas = self._vuelos.ejecutar("maquinas:listar", lambda: self._recargar_listado(maquinas_cache))
+            self._l1.guardar("maquinas:listar", maquinas)
             return maquinas
 
-        # Si hay término, NO usamos cache
-        termino_normalizado = termino.strip().lower()
-        
+        # Si hay término, NO usamos cache: el filtro se resuelve en MySQL
+        filtradas = self.dao.buscar_similares(termino)
+
+        return filtradas
+
+    # Listado completo ya serializado (bytes JSON) para la ruta /listar
+    # Con el índice Redis fresco se unen los JSON guardados sin decodificarlos: casi no usa CPU
+    def listar_maquinas_json(self) -> bytes:
+        contenido = self._l1.obtener("maquinas:listar:json")
+        if contenido is not None:
+            return contenido
+
+        try:
+            contenido, edad = self.cache.listar_json_con_edad()
+        except Exception as redis_error:
+            logger.warning("Error leyendo Redis: %s", redis_error)
+            contenido, edad = None, None
+
+        # Índice vencido, incompleto o Redis caído: camino normal (recarga coordinada) y serializar
+        fresco = contenido is not None and edad is not None and edad < self.cache.TTL_SUAVE
+        self._contador_redis.registrar(fresco, "maquinas:listar:json")
+        if not fresco:
+            contenido = Serializador.dumps(self.buscar_maquinas())
+        self._l1.guardar("maquinas:listar:json", contenido)
+        return contenido
+
+    # Recorre las máquinas desde MySQL con un cursor sin buffer (para respuestas en streaming)
+    # No pasa por la caché: el listado completo se envía sin armarlo en memoria
+    def iterar_maquinas(self, termino: str = None, tipo: str = None, estado: str = None, area: str = None):
+        for bloque in self.dao.iterar(termino, tipo, estado, area):
+            yield from bloque
+
+    # Búsqueda filtrada y paginada en MySQL (el tamaño de la respuesta depende de la página, no de la tabla)
+    def buscar_paginado(self, termino: str = None, tipo: str = None, estado: str = None, area: str = None,
+                        limite: int = 50, despues_de: str = None, incluir_total: bool = False) -> dict:
+        # Se pide una fila extra para saber si hay página siguiente
+        maquinas = self.dao.buscar_paginado(termino, tipo, estado, area, limite + 1, despues_de)
+        hay_mas = len(maquinas) > limite
+        maquinas = maquinas[:limite]
+
+        resultado = {
+            "items": maquinas,
+            "siguiente": maquinas[-1]["codigo"] if hay_mas else None
+        }
+        if incluir_total:
+            resultado["total"] = self.dao.contar(termino, tipo, estado, area)
+        return resultado
+
+    # Método auxiliar: Recarga el listado desde MySQL coordinando a todos los backends
+    def _recargar_listado(self, maquinas_obsoletas: list) -> list:
+        # Bloqueo distribuido: solo un backend reconstruye el índice tras cada vencimiento
+        redis_disponible = True
         try:
-            todas = self.dao.listar_todas()
-        except Exception:
-            todas = self._obtener_maquinas_desde_redis_fallback()
+            token = self.cache.adquirir_bloqueo()
+        except Exception as redis_error:
+            logger.warning("Error tomando bloqueo en Redis: %s", redis_error)
+            token = None
+            redis_disponible = False
+
+        if redis_disponible and token is None:
+            # Otro backend está reconstruyendo: servir el índice obsoleto si lo hay
+            if maquinas_obsoletas is not None:
+                logger.debug("Listado desde Redis (obsoleto, otro backend recarga)")
+                return maquinas_obsoletas
+
+            # Sin copia obsoleta: esperar brevemente a que el otro backend termine
+            limite = time.monotonic() + self.ESPERA_RECONSTRUCCION
+            while time.monotonic() < limite:
+                time.sleep(0.05)
+                try:
+                    maquinas_cache = self.cache.listar()
+                except Exception:
+                    break
+                if maquinas_cache is not None:
+                    logger.debug("Listado desde Redis (reconstruido por otro backend)")
+                    return maquinas_cache
+
+        try:
+            # Versión del listado antes de leer MySQL: si alguien escribe mientras tanto, el volcado se combina
+            try:
+                version = self.cache.version()
+            except Exception:
+                version = None
 
-        # Convertir fechas para búsquedas con término
-        for maquina in todas:
-            if 'fecha' in maquina and hasattr(maquina['fecha'], 'strftime'):
-                maquina['fecha'] = maquina['fecha'].strftime('%Y-%m-%d')
+            # Consultar base de datos con fallback a Redis
+            try:
+                maquinas = self.dao.listar_todas()
+                logger.info("Listado recargado desde MySQL", extra={"filas": len(maquinas)})
+            except Exception as db_error:
+                logger.warning("Error MySQL: %s - Intentando fallback Redis", db_error)
+                maquinas = self._obtener_maquinas_desde_redis_fallback()
 
-        filtradas = []
-        for maquina in todas:
-            codigo_maquina = str(maquina.get("codigo", "")).lower()
-            if termino_normalizado in codigo_maquina:
-                filtradas.append(maquina)
+            # Reconstruir índice Redis (fresco TTL_SUAVE, utilizable hasta TTL_DURO)
+            if version is not None:
+                try:
+                    if self.cache.reconstruir(maquinas, version):
+                        logger.debug("Índice Redis reconstruido")
+                    else:
+                        logger.debug("Índice Redis reconstruido combinando las escrituras hechas durante la recarga")
+                except Exception as redis_error:
+                    logger.warning("No se pudo guardar en Redis: %s", redis_error)
 
-        return filtradas
+            return maquinas
+        finally:
+            if token:
+                try:
+                    self.cache.liberar_bloqueo(token)
+                except Exception:
+                    pass
 
     # Método auxiliar: Verificación de duplicados con fallback Redis
     def _existe_codigo_con_redis(self, codigo: str) -> bool:
         codigo_normalizado = codigo.strip().lower()
+
+        # 0️⃣ Caché L1 del proceso
+        if self._l1.obtener(f"maquina:{codigo_normalizado}", "maquina") is not None:
+            return True
         
-        # 1️⃣ Primero intentar verificar en Redis
+        # 1️⃣ Primero intentar verificar en el índice Redis (HEXISTS, O(1))
         try:
-            # Verificar en máquina individual
-            if redis_client.exists(f"siglab:maquina:{codigo_normalizado}"):
+            existe = self.cache.existe(codigo_normalizado)
+            self._contador_redis.registrar(existe, "maquina")
+            if existe:
                 return True
-                
-            # Verificar en lista completa
-            lista_cache = redis_client.get("siglab:maquinas:listar")
-            if lista_cache:
-                maquinas = json.loads(lista_cache)
-                return any(str(m.get("codigo", "")).lower() == codigo_normalizado for m in maquinas)
-                
         except Exception as redis_error:
-            print(f"⚠️ Error verificando en Redis: {str(redis_error)}")
+            logger.warning("Error verificando en Redis: %s", redis_error)
         
         # 2️⃣ Fallback a Base de Datos
         try:
             return self._existe_codigo(codigo)
         except Exception as db_error:
-            print(f"⚠️ Error verificando en DB: {str(db_error)}")
+            logger.warning("Error verificando en DB: %s", db_error)
             return False
 
-    # Método auxiliar: Actualizar caché Redis con nueva máquina
-    def _actualizar_cache_redis_con_nueva_maquina(self, nueva_maquina: dict):
-        try:
-            # Obtener lista actual
-            lista_actual = redis_client.get("siglab:maquinas:listar")
-            
-            if lista_actual:
-                maquinas = json.loads(lista_actual)
-                maquinas.append(nueva_maquina)
-            else:
-                maquinas = [nueva_maquina]
-            
-            # Actualizar caché
-            redis_client.setex("siglab:maquinas:listar", 60, json.dumps(maquinas))
-            print("🔄 Caché Redis actualizada con nueva máquina")
-            
-        except Exception as e:
-            print(f"⚠️ Error actualizando caché Redis: {str(e)}")
-
     # Método auxiliar: Fallback para obtener máquinas desde Redis
     def _obtener_maquinas_desde_redis_fallback(self) -> list:
-        print("🔄 Modo resiliencia: Obteniendo máquinas desde Redis")
+        logger.warning("Modo resiliencia: obteniendo máquinas desde Redis")
         
         try:
-            # Intentar obtener lista completa
-            lista_cache = redis_client.get("siglab:maquinas:listar")
-            if lista_cache:
-                return json.loads(lista_cache)
-            
-            # Si no hay lista, reconstruir desde máquinas individuales
-            maquinas = []
-            for key in redis_client.scan_iter(match="siglab:maquina:*"):
-                datos_maquina = redis_client.get(key)
-                if datos_maquina:
-                    maquinas.append(json.loads(datos_maquina))
-            
-            if maquinas:
-                # Guardar lista reconstruida
-                redis_client.setex("siglab:maquinas:listar", 60, json.dumps(maquinas))
-                print("🔄 Lista reconstruida desde máquinas individuales")
-            
-            return maquinas
+            # Devolver lo que haya en el índice aunque no esté marcado como completo
+            return self.cache.listar(solo_completo=False)
             
         except Exception as e:
-            print(f"❌ Error crítico en fallback Redis: {str(e)}")
+            logger.error("Error crítico en fallback Redis: %s", e)
             return []
 
 
+    # Convierte fechas de MySQL (date) a texto para JSON
+    @staticmethod
+    def _fecha_a_texto(fecha):
+        if hasattr(fecha, 'strftime'):
+            return fecha.strftime('%Y-%m-%d')
+        return fecha
+
     # Verifica si existe código (case-insensitive)
     def _existe_codigo(self, codigo: str) -> bool:
-        codigo_normalizado = codigo.strip().lower()
-        todas = self.dao.listar_todas()
-        
-        for maquina in todas:
-            codigo_db = str(maquina.get("codigo", "")).lower()
-            if codigo_normalizado == codigo_db:
-                return True
-        return False
+        return self.obtener_por_codigo(codigo) is not None
 
     # Obtiene máquina por código (case-insensitive)
     def obtener_por_codigo(self, codigo: str) -> dict:
         codigo_normalizado = codigo.strip().lower()
-        todas = self.dao.listar_todas()
-        
-        for maquina in todas:
-            codigo_db = str(maquina.get("codigo", "")).lower()
-            if codigo_normalizado == codigo_db:
-                return maquina
-        return None
+
+        # Caché L1 del proceso (solo se guardan máquinas existentes)
+        maquina = self._l1.obtener(f"maquina:{codigo_normalizado}", "maquina")
+        if maquina is not None:
+            return maquina
+
+        maquina = self.dao.buscar_por_codigo_normalizado(codigo_normalizado)
+        if maquina:
+            self._l1.guardar(f"maquina:{codigo_normalizado}", maquina)
+        return maquina
@@ -0,0 +1,70 @@
+# SERVICE - Estado de salud del backend y de sus bases de datos
+# Responsabilidades: verificar MySQL, MongoDB y Redis en paralelo con un tiempo máximo, sin lógica de negocio
+
+import os
+import time
+import asyncio
+import anyio
+from app.database.database_manager import DatabaseManager
+
+class SaludService:
+    # Tiempo máximo de cada verificación (segundos)
+    TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "0.5"))
+    # Un resultado se reutiliza durante este tiempo: varios monitores consultando no multiplican los pings
+    VIGENCIA = float(os.getenv("HEALTH_CACHE_MS", "250")) / 1000
+    SERVIDOR = os.getenv("SERVER_ID", "")
+
+    _ultimo = None
+    _momento = 0.0
+    _lock = None
+    # Hilos propios para los pings: si una base se cuelga, no ocupan los hilos de las peticiones
+    _limitador = None
+
+    # Devuelve el estado de las tres bases de datos: "ok" (todas responden), "degradado" (alguna falla)
+    # o "caido" (ninguna responde). El backend sigue atendiendo en modo degradado (fallback Redis/MySQL)
+    @classmethod
+    async def verificar(cls) -> dict:
+        if cls._lock is None:
+            cls._lock = asyncio.Lock()
+            cls._limitador = anyio.CapacityLimiter(6)
+        async with cls._lock:
+            if cls._ultimo is not None and time.monotonic() - cls._momento < cls.VIGENCIA:
+                return cls._ultimo
+
+            comprobaciones = {
+                "mysql": lambda: DatabaseManager.ping_mysql(cls.TIMEOUT),
+                "mongodb": DatabaseManager.ping_mongodb,
+                "redis": DatabaseManager.ping_redis,
+            }
+            dependencias = {}
+            async with anyio.create_task_group() as grupo:
+                for nombre, funcion in comprobaciones.items():
+                    grupo.start_soon(cls._comprobar, nombre, funcion, dependencias)
+
+            activas = sum(1 for dependencia in dependencias.values() if dependencia["ok"])
+            if activas == len(dependencias):
+                estado = "ok"
+            elif activas:
+                estado = "degradado"
+            else:
+                estado = "caido"
+
+            dependencias = {nombre: dependencias[nombre] for nombre in comprobaciones}
+            cls._ultimo = {"estado": estado, "servidor": cls.SERVIDOR, "dependencias": dependencias}
+            cls._momento = time.monotonic()
+            return cls._ultimo
+
+    # Ejecuta un ping en un hilo (fuera del limitador de BD, para no esperar detrás de las consultas)
+    # Si supera el tiempo máximo se informa como caído aunque el hilo siga hasta terminar
+    # (los pings colgados quedan acotados por el limitador propio)
+    @classmethod
+    async def _comprobar(cls, nombre: str, funcion, resultados: dict):
+        inicio = time.perf_counter()
+        try:
+            with anyio.fail_after(cls.TIMEOUT):
+                await anyio.to_thread.run_sync(funcion, cancellable=True, limiter=cls._limitador)
+            resultados[nombre] = {"ok": True, "ms": round((time.perf_counter() - inicio) * 1000, 2)}
+        except TimeoutError:
+            resultados[nombre] = {"ok": False, "error": f"Sin respuesta en {cls.TIMEOUT}s"}
+        except Exception as e:
+            resultados[nombre] = {"ok": False, "error": str(e)}
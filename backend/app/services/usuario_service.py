@@ -1,30 +1,32 @@
 # Service - Lógica de negocio de usuarios
 # Responsabilidades: validación de negocio, coordinación con DAOs
 
+import logging
 from app.daos.usuario_dao import UsuarioDAO
 from app.models.Usuario import Usuario
+from app.utils.concurrencia import Concurrencia
+from app.utils.encryption import Encryption
+
+logger = logging.getLogger(__name__)
 
 class UsuarioService:
     def __init__(self):
         self.dao = UsuarioDAO()
     
-    def registrar_usuario(self, datos: dict) -> tuple:
+    # Registro y login son async: solo la consulta y el INSERT ocupan un hilo del limitador de BD;
+    # bcrypt (hasta BCRYPT_TIMEOUT) se espera en el event loop, así una ráfaga de logins no frena al resto
+    async def registrar_usuario(self, datos: dict) -> tuple:
         # Registra nuevo usuario con validaciones
         try:
-            print(f"DEBUG: Datos recibidos: {datos}")
-            
             # Validaciones de negocio
             if not all([datos.get('nombre_completo'), datos.get('username'), datos.get('password')]):
-                print("DEBUG: Faltan campos requeridos")
                 return None, "Todos los campos son requeridos"
             
             if len(datos.get('password', '')) < 6:
-                print("DEBUG: Contraseña muy corta")
                 return None, "La contraseña debe tener al menos 6 caracteres"
             
             # Verificar si usuario ya existe
-            usuario_existente = self.dao.obtener_usuario_por_username(datos.get('username'))
-            print(f"DEBUG: Usuario existente: {usuario_existente}")
+            usuario_existente = await Concurrencia.ejecutar(self.dao.obtener_usuario_por_username, datos.get('username'))
             if usuario_existente:
                 return None, "El nombre de usuario ya existe"
             
@@ -36,42 +38,41 @@ class UsuarioService:
                 datos.get('rol', 'usuario')
             )
             
-            print(f"DEBUG: Usuario creado: {usuario.to_dict()}")
-            
             # Validar datos del modelo
             try:
                 usuario.validar_datos()
-                print("DEBUG: Validación exitosa")
             except ValueError as e:
-                print(f"DEBUG: Error en validación: {e}")
                 return None, str(e)
             
-            # Guardar usuario
-            resultado = self.dao.guardar(usuario)
-            print(f"DEBUG: Resultado guardado: {resultado}")
+            # Encriptar en el pool de bcrypt y guardar usuario
+            password_encriptado = await Encryption.encriptar_password_async(usuario.password)
+            resultado = await Concurrencia.ejecutar(self.dao.guardar, usuario, password_encriptado)
             
             if resultado:
+                logger.info("Usuario registrado", extra={"username": usuario.username, "rol": usuario.rol})
                 return {"mensaje": "Usuario creado correctamente"}, None
             
             return None, "Error al crear usuario"
             
         except ValueError as e:
-            print(f"DEBUG: ValueError: {e}")
             return None, str(e)
+        except TimeoutError:
+            # Cola de bcrypt saturada: la ruta responde 503
+            raise
         except Exception as e:
-            print(f"DEBUG: Exception general: {e}")
+            logger.exception("Error registrando usuario")
             return None, f"Error en el servicio: {str(e)}"
     
-    def autenticar_usuario(self, username: str, password: str) -> tuple:
+    async def autenticar_usuario(self, username: str, password: str) -> tuple:
         # Autentica usuario y maneja sesión
         try:
             if not username or not password:
                 return None, "Usuario y contraseña son requeridos"
             
-            # Verificar credenciales
-            usuario = self.dao.verificar_credenciales(username, password)
+            # Verificar credenciales (la conexión ya se devolvió al pool cuando se calcula el hash)
+            usuario = await Concurrencia.ejecutar(self.dao.obtener_por_username, username)
             
-            if usuario:
+            if usuario and await Encryption.verificar_password_async(password, usuario['password']):
                 return {
                     "mensaje": "Login exitoso",
                     "token": username,  # Token temporal
@@ -84,6 +85,9 @@ class UsuarioService:
             
             return None, "Usuario o contraseña incorrectos"
             
+        except TimeoutError:
+            # Cola de bcrypt saturada: la ruta responde 503
+            raise
         except Exception as e:
             return None, f"Error en el servicio: {str(e)}"
     
@@ -0,0 +1,79 @@
+# Este archivo implementa la caché L1 en memoria de cada proceso (LRU con TTL)
+# Evita ir a Redis o MySQL por datos que el mismo worker acaba de leer
+# La coherencia entre backends se mantiene con invalidaciones por pub/sub de Redis
+
+import time
+import threading
+from collections import OrderedDict
+from app.utils.metricas import Metricas
+from app.utils.registro import Registro
+
+class CacheLocal:
+    def __init__(self, capacidad: int, ttl: float):
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    # Devuelve el valor si existe y no venció; None en caso contrario
+    # "familia" agrupa las claves en las métricas (por ejemplo "maquina" para "maquina:<código>")
+    def obtener(self, clave: str, familia: str = None):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    del self._datos[clave]
+                self.fallos += 1
+                valor = None
+            else:
+                # Marcar como usado recientemente
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                valor = entrada[1]
+        Metricas.cache("l1", familia or clave, valor is not None)
+        Registro.cache("l1", familia or clave, valor is not None)
+        return valor
+
+    # Guarda un valor desalojando el menos usado si se supera la capacidad
+    def guardar(self, clave: str, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, *claves: str):
+        with self._lock:
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {"aciertos": self.aciertos, "fallos": self.fallos, "entradas": len(self._datos)}
+
+# Contadores de aciertos/fallos para niveles de caché que no son L1 (por ejemplo Redis)
+class ContadorCache:
+    def __init__(self, nivel: str):
+        self.nivel = nivel
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def registrar(self, acierto: bool, familia: str):
+        with self._lock:
+            if acierto:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+        Metricas.cache(self.nivel, familia, acierto)
+        Registro.cache(self.nivel, familia, acierto)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {"aciertos": self.aciertos, "fallos": self.fallos}
@@ -0,0 +1,26 @@
+# Este archivo permite llamar a los services (síncronos) desde las rutas async
+# Los drivers de MySQL, MongoDB y Redis bloquean: si se llaman directamente dentro
+# de un "async def" congelan el event loop y el worker atiende una petición a la vez
+
+import os
+from functools import partial
+import anyio
+from app.database.mysql import MySQLConnection
+
+class Concurrencia:
+    # Máximo de hilos ejecutando operaciones de BD a la vez (por defecto, el tamaño del pool MySQL con su desborde)
+    HILOS_BD = int(os.getenv("DB_THREADS", str(MySQLConnection.POOL_SIZE + MySQLConnection.POOL_OVERFLOW)))
+
+    _limitador = None
+
+    # Limitador compartido para no abrir más hilos que conexiones disponibles
+    @classmethod
+    def limitador(cls):
+        if cls._limitador is None:
+            cls._limitador = anyio.CapacityLimiter(cls.HILOS_BD)
+        return cls._limitador
+
+    # Ejecuta una función bloqueante en un hilo y espera su resultado sin bloquear el event loop
+    @classmethod
+    async def ejecutar(cls, funcion, *args, **kwargs):
+        return await anyio.to_thread.run_sync(partial(funcion, *args, **kwargs), limiter=cls.limitador())
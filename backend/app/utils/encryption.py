@@ -1,28 +1,44 @@
 # Este archivo contiene funciones para encriptar y verificar contraseñas
 # Usamos bcrypt que es una librería segura para encriptar contraseñas
 
+import os
 # Importamos la librería bcrypt
 import bcrypt
+from app.utils.hash_executor import HashExecutor
+
+# Costo (work factor) de bcrypt: cada +1 duplica el tiempo de cálculo
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Funciones de módulo para que puedan enviarse a los procesos del pool
+def _hashear(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+def _verificar(password: bytes, hash_guardado: bytes) -> bool:
+    return bcrypt.checkpw(password, hash_guardado)
 
 class Encryption:
     # Esta clase contiene métodos estáticos para trabajar con contraseñas
-    
+
     # Esta función encripta una contraseña
     @staticmethod
     def encriptar_password(password):
-        # Generamos una "sal" (salt) que es un valor aleatorio para hacer la encriptación más segura
-        salt = bcrypt.gensalt()
-        # Encriptamos la contraseña usando la sal
+        # Generamos una "sal" (salt) con el costo configurado y encriptamos en el pool de procesos
         # Primero convertimos la contraseña a bytes, luego la encriptamos, y finalmente la convertimos a string
-        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
-    
-    # Esta función verifica si una contraseña coincide con el hash guardado
+        return HashExecutor.ejecutar(_hashear, password.encode('utf-8'), BCRYPT_ROUNDS).decode('utf-8')
+
+    # Versión async de encriptar_password (no bloquea el event loop ni ocupa un hilo del limitador de BD)
+    @staticmethod
+    async def encriptar_password_async(password):
+        resultado = await HashExecutor.ejecutar_async(_hashear, password.encode('utf-8'), BCRYPT_ROUNDS)
+        return resultado.decode('utf-8')
+
+    # Verifica si una contraseña coincide con el hash guardado (False si no coincide o el hash está mal formado)
+    # Lanza TimeoutError si la cola de bcrypt está saturada: es sobrecarga, no una contraseña incorrecta
     @staticmethod
-    def verificar_password(password, hash_guardado):
+    async def verificar_password_async(password, hash_guardado):
         try:
             # Comparamos la contraseña ingresada con el hash guardado
-            # Si coinciden, retorna True, si no, retorna False
-            return bcrypt.checkpw(password.encode('utf-8'), hash_guardado.encode('utf-8'))
-        except:
-            # Si hay algún error, retornamos False
+            return await HashExecutor.ejecutar_async(_verificar, password.encode('utf-8'), hash_guardado.encode('utf-8'))
+        except ValueError:
+            # bcrypt rechaza el hash guardado ("Invalid salt")
             return False
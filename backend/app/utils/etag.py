@@ -0,0 +1,40 @@
+# Este archivo implementa las peticiones condicionales HTTP (ETag / If-None-Match)
+# El ETag se arma con los contadores de versión de Redis: si el cliente ya tiene esa versión
+# se responde 304 sin consultar MySQL ni MongoDB
+
+from fastapi import Request
+from fastapi.responses import Response
+
+class ETag:
+    # El navegador y nginx pueden guardar la respuesta pero deben revalidarla en cada uso
+    CACHE_CONTROL = "no-cache"
+
+    # ETag fuerte a partir de la época y las versiones
+    @staticmethod
+    def construir(*partes) -> str:
+        return '"' + "-".join(str(parte) for parte in partes) + '"'
+
+    # Indica si alguna de las versiones que envió el cliente es la actual
+    @staticmethod
+    def coincide(request: Request, etag: str) -> bool:
+        if not etag:
+            return False
+        cabecera = request.headers.get("if-none-match")
+        if not cabecera:
+            return False
+        if cabecera.strip() == "*":
+            return True
+        # Comparación débil (RFC 9110): se ignora el prefijo W/ que agregan algunos proxies
+        return any(valor.strip().removeprefix("W/") == etag for valor in cabecera.split(","))
+
+    # Cabeceras de una respuesta versionada (sin ETag si Redis no estaba disponible)
+    @classmethod
+    def cabeceras(cls, etag: str) -> dict:
+        cabeceras = {"Cache-Control": cls.CACHE_CONTROL, "Vary": "Accept"}
+        if etag:
+            cabeceras["ETag"] = etag
+        return cabeceras
+
+    @classmethod
+    def no_modificado(cls, etag: str) -> Response:
+        return Response(status_code=304, headers=cls.cabeceras(etag))
@@ -0,0 +1,157 @@
+# Este archivo ejecuta las operaciones de bcrypt en un pool de procesos acotado
+# bcrypt es lento a propósito: si corre dentro del proceso del servidor, una ráfaga
+# de logins acapara la CPU y frena al resto de endpoints del mismo worker
+
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import anyio
+
+class HashExecutor:
+    # Procesos dedicados a bcrypt (0 = ejecutar en el mismo proceso, útil en desarrollo)
+    # Por defecto los núcleos se reparten entre los workers del servidor (WEB_CONCURRENCY)
+    PROCESOS = int(os.getenv("BCRYPT_WORKERS", str(max((os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1")), 1))))
+    # Tareas que pueden esperar en cola además de las que se están ejecutando
+    COLA_MAXIMA = int(os.getenv("BCRYPT_QUEUE_SIZE", str(max(PROCESOS, 1) * 8)))
+    # Segundos máximos esperando un resultado antes de rendirse
+    TIMEOUT = float(os.getenv("BCRYPT_TIMEOUT", "10"))
+
+    _executor = None
+    _lock = threading.Lock()
+    _cupos = threading.BoundedSemaphore(max(PROCESOS, 1) + COLA_MAXIMA)
+
+    # Métricas del pool
+    _pendientes = 0
+    _max_pendientes = 0
+    _completadas = 0
+    _timeouts = 0
+    _segundos_totales = 0.0
+
+    # Crea el pool de procesos la primera vez que se necesita
+    @classmethod
+    def _obtener_executor(cls):
+        if cls.PROCESOS <= 0:
+            return None
+        with cls._lock:
+            if cls._executor is None:
+                # "spawn" evita heredar hilos y conexiones abiertas del proceso del servidor
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=cls.PROCESOS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return cls._executor
+
+    # Ejecuta la función en el pool y espera el resultado (bloquea solo al hilo que llama)
+    @classmethod
+    def ejecutar(cls, funcion, *args):
+        executor = cls._obtener_executor()
+        if executor is None:
+            return funcion(*args)
+
+        # Si la cola está llena se espera un cupo en lugar de acumular trabajo sin límite
+        if not cls._cupos.acquire(timeout=cls.TIMEOUT):
+            with cls._lock:
+                cls._timeouts += 1
+            raise TimeoutError("Cola de bcrypt saturada")
+
+        futuro = cls._enviar(executor, funcion, args)
+        if futuro is None:
+            return funcion(*args)
+        try:
+            return futuro.result(timeout=cls.TIMEOUT)
+        except TimeoutError:
+            with cls._lock:
+                cls._timeouts += 1
+            raise
+        except BrokenProcessPool:
+            cls._descartar_executor()
+            return funcion(*args)
+
+    # Versión async: el resultado del proceso se espera en el event loop, sin ocupar ningún hilo
+    # (solo se usa un hilo para esperar cupo cuando la cola de bcrypt está llena)
+    @classmethod
+    async def ejecutar_async(cls, funcion, *args):
+        executor = cls._obtener_executor()
+        if executor is None:
+            return await anyio.to_thread.run_sync(partial(funcion, *args))
+
+        if not cls._cupos.acquire(blocking=False):
+            if not await anyio.to_thread.run_sync(partial(cls._cupos.acquire, timeout=cls.TIMEOUT)):
+                with cls._lock:
+                    cls._timeouts += 1
+                raise TimeoutError("Cola de bcrypt saturada")
+
+        futuro = cls._enviar(executor, funcion, args)
+        if futuro is None:
+            return await anyio.to_thread.run_sync(partial(funcion, *args))
+        try:
+            with anyio.fail_after(cls.TIMEOUT):
+                return await asyncio.wrap_future(futuro)
+        except TimeoutError:
+            with cls._lock:
+                cls._timeouts += 1
+            raise
+        except BrokenProcessPool:
+            cls._descartar_executor()
+            return await anyio.to_thread.run_sync(partial(funcion, *args))
+
+    # Envía la tarea al pool con un cupo ya tomado; devuelve None si el pool está roto (cupo devuelto)
+    # El cupo se devuelve cuando la tarea termina en el proceso, no cuando se deja de esperarla:
+    # tras un timeout bcrypt sigue ocupando su lugar y no pueden correr más tareas que cupos
+    @classmethod
+    def _enviar(cls, executor, funcion, args):
+        inicio = time.perf_counter()
+        with cls._lock:
+            cls._pendientes += 1
+            cls._max_pendientes = max(cls._max_pendientes, cls._pendientes)
+        try:
+            futuro = executor.submit(funcion, *args)
+        except BrokenProcessPool:
+            cls._liberar(inicio)
+            cls._descartar_executor()
+            return None
+        futuro.add_done_callback(lambda _: cls._liberar(inicio))
+        return futuro
+
+    # Devuelve el cupo de una tarea terminada (o cancelada antes de empezar) y registra su duración
+    @classmethod
+    def _liberar(cls, inicio: float):
+        with cls._lock:
+            cls._pendientes -= 1
+            cls._completadas += 1
+            cls._segundos_totales += time.perf_counter() - inicio
+        cls._cupos.release()
+
+    # Un proceso murió: se descarta el pool para recrearlo en la siguiente llamada
+    @classmethod
+    def _descartar_executor(cls):
+        with cls._lock:
+            cls._executor = None
+
+    # Métricas de la cola para monitoreo
+    @classmethod
+    def estadisticas(cls) -> dict:
+        with cls._lock:
+            procesos = max(cls.PROCESOS, 0)
+            return {
+                "procesos": procesos,
+                "pendientes": cls._pendientes,
+                "en_cola": max(cls._pendientes - procesos, 0),
+                "max_pendientes": cls._max_pendientes,
+                "completadas": cls._completadas,
+                "timeouts": cls._timeouts,
+                "promedio_ms": round(cls._segundos_totales * 1000 / cls._completadas, 2) if cls._completadas else 0.0
+            }
+
+    # Cierra el pool de procesos al apagar el servidor
+    @classmethod
+    def cerrar(cls):
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=False, cancel_futures=True)
+                cls._executor = None
@@ -0,0 +1,58 @@
+# Este archivo convierte el cuerpo de las peticiones de carga masiva en una lista de filas
+# Formatos admitidos: array JSON, NDJSON (un objeto por línea) o CSV con cabecera,
+# enviados en el cuerpo o como archivo "archivo" en multipart/form-data
+
+import csv
+import io
+import json
+from fastapi import Request
+
+class LectorLotes:
+    # Clave bajo la que csv.DictReader deja los valores que no tienen columna en la cabecera
+    SOBRANTES = "__sobrantes__"
+
+    # Devuelve las filas del lote como diccionarios; lanza ValueError si el formato no es válido
+    @staticmethod
+    async def leer(request: Request) -> list:
+        tipo_contenido = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        nombre_archivo = ""
+
+        if tipo_contenido == "multipart/form-data":
+            formulario = await request.form()
+            archivo = formulario.get("archivo")
+            if archivo is None or not hasattr(archivo, "read"):
+                raise ValueError("Falta el archivo 'archivo'")
+            contenido = await archivo.read()
+            tipo_contenido = (archivo.content_type or "").lower()
+            nombre_archivo = (archivo.filename or "").lower()
+        else:
+            contenido = await request.body()
+
+        try:
+            texto = contenido.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ValueError("El contenido debe estar en UTF-8")
+
+        if "csv" in tipo_contenido or nombre_archivo.endswith(".csv"):
+            # Los valores de más quedan bajo SOBRANTES (sin restkey, DictReader los pone en una lista con clave None)
+            lector = csv.DictReader(io.StringIO(texto), restkey=LectorLotes.SOBRANTES)
+            filas = []
+            try:
+                for fila in lector:
+                    if LectorLotes.SOBRANTES in fila:
+                        raise ValueError(f"La línea {lector.line_num} del CSV tiene más columnas que la cabecera")
+                    filas.append({(clave or "").strip(): (valor or "").strip() for clave, valor in fila.items()})
+            except csv.Error as e:
+                raise ValueError(f"CSV inválido (línea {lector.line_num}): {e}")
+            return filas
+
+        try:
+            if "ndjson" in tipo_contenido or nombre_archivo.endswith((".ndjson", ".jsonl")):
+                return [json.loads(linea) for linea in texto.splitlines() if linea.strip()]
+            filas = json.loads(texto)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido: {e}")
+
+        if not isinstance(filas, list):
+            raise ValueError("Se esperaba un array JSON")
+        return filas
@@ -0,0 +1,189 @@
+# Este archivo define las métricas Prometheus del backend y cómo se recolectan
+#   - Peticiones HTTP: conteo, latencia (histograma) y en curso, por ruta
+#   - Tiempo de cada operación de los DAOs (MySQL, MongoDB, Redis)
+#   - Aciertos y fallos de caché por nivel (L1/Redis) y familia de clave
+#   - Estado del pool MySQL, del pool de bcrypt y de la caché L1 (se leen al exportar)
+# Con varios workers (PROMETHEUS_MULTIPROC_DIR definido) cada proceso escribe sus valores en archivos
+# compartidos y /metrics los suma, sin importar qué worker atienda la consulta
+
+import os
+import time
+import inspect
+import functools
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.routing import Match
+
+# Buckets pensados para una API que responde en milisegundos pero puede tardar segundos bajo carga
+BUCKETS_HTTP = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_BD = (0.0002, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PETICIONES = Counter(
+    "siglab_http_peticiones_total", "Peticiones HTTP atendidas", ["metodo", "ruta", "estado"]
+)
+LATENCIA = Histogram(
+    "siglab_http_latencia_segundos", "Duración de las peticiones HTTP hasta enviar el último byte",
+    ["metodo", "ruta"], buckets=BUCKETS_HTTP
+)
+EN_CURSO = Gauge(
+    "siglab_http_peticiones_en_curso", "Peticiones HTTP que se están atendiendo", ["metodo", "ruta"],
+    multiprocess_mode="livesum"
+)
+OPERACIONES_BD = Histogram(
+    "siglab_bd_operacion_segundos", "Duración de las operaciones de los DAOs",
+    ["bd", "operacion"], buckets=BUCKETS_BD
+)
+ERRORES_BD = Counter(
+    "siglab_bd_errores_total", "Operaciones de los DAOs que lanzaron una excepción", ["bd", "operacion"]
+)
+CACHE = Counter(
+    "siglab_cache_consultas_total", "Consultas a la caché", ["nivel", "familia", "resultado"]
+)
+
+class Metricas:
+    # Ruta con la que se etiquetan las peticiones que no corresponden a ningún endpoint
+    RUTA_DESCONOCIDA = "desconocida"
+
+    # Registra un acierto o fallo de caché
+    @staticmethod
+    def cache(nivel: str, familia: str, acierto: bool):
+        CACHE.labels(nivel, familia, "acierto" if acierto else "fallo").inc()
+
+    # Decorador de clase: mide todos los métodos públicos de un DAO
+    # Los generadores (cursores en streaming) no se miden: su duración depende del cliente
+    @staticmethod
+    def instrumentar(bd: str):
+        def decorar(clase):
+            for nombre, metodo in list(vars(clase).items()):
+                if nombre.startswith("_") or not inspect.isfunction(metodo) or inspect.isgeneratorfunction(metodo):
+                    continue
+                setattr(clase, nombre, Metricas._medir(bd, f"{clase.__name__}.{nombre}", metodo))
+            return clase
+        return decorar
+
+    @staticmethod
+    def _medir(bd: str, operacion: str, funcion):
+        histograma = OPERACIONES_BD.labels(bd, operacion)
+        errores = ERRORES_BD.labels(bd, operacion)
+
+        @functools.wraps(funcion)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            except Exception:
+                errores.inc()
+                raise
+            finally:
+                histograma.observe(time.perf_counter() - inicio)
+        return medida
+
+    _registro_multiproceso = None
+
+    # Texto de exposición de Prometheus con todas las métricas registradas
+    @classmethod
+    def exportar(cls) -> tuple:
+        if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+        if cls._registro_multiproceso is None:
+            # Suma de todos los workers más el estado de los pools del worker que responde (etiqueta "worker")
+            registro = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registro)
+            registro.register(_ColectorEstado(worker=str(os.getpid())))
+            cls._registro_multiproceso = registro
+        return generate_latest(cls._registro_multiproceso), CONTENT_TYPE_LATEST
+
+# Middleware ASGI: mide cada petición hasta que se envía el último byte (incluye respuestas en streaming)
+# La ruta se etiqueta con la plantilla del endpoint (/api/maquinas/eliminar/{codigo}), no con la URL real
+class MetricasMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def _plantilla(scope) -> str:
+        for ruta in scope["app"].router.routes:
+            coincidencia, _ = ruta.matches(scope)
+            if coincidencia == Match.FULL:
+                return ruta.path
+        return Metricas.RUTA_DESCONOCIDA
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metodo = scope["method"]
+        ruta = self._plantilla(scope)
+        estado = {"codigo": 500}
+        en_curso = EN_CURSO.labels(metodo, ruta)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+            await send(mensaje)
+
+        inicio = time.perf_counter()
+        en_curso.inc()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            en_curso.dec()
+            LATENCIA.labels(metodo, ruta).observe(time.perf_counter() - inicio)
+            PETICIONES.labels(metodo, ruta, str(estado["codigo"])).inc()
+
+# Métricas que se leen en el momento de exportar a partir de las estadísticas de cada componente
+# Los pools son de cada proceso: con varios workers se etiquetan con el pid del worker que respondió
+class _ColectorEstado:
+    def __init__(self, worker: str = None):
+        self.worker = worker
+        self.etiquetas = [] if worker is None else ["worker"]
+        self.valores = [] if worker is None else [worker]
+
+    # Sin describe() prometheus_client llamaría a collect() al registrar (antes de que existan los pools)
+    def describe(self):
+        return []
+
+    def _metrica(self, tipo, nombre: str, ayuda: str, valor):
+        familia = tipo(nombre, ayuda, labels=self.etiquetas)
+        familia.add_metric(self.valores, valor)
+        return familia
+
+    def collect(self):
+        from app.database.mysql import MySQLConnection
+        from app.utils.hash_executor import HashExecutor
+        from app.services.maquina_service import MaquinaService
+
+        pool = MySQLConnection.estadisticas()
+        if pool:
+            conexiones = GaugeMetricFamily("siglab_mysql_pool_conexiones", "Conexiones del pool MySQL",
+                                           labels=["estado"] + self.etiquetas)
+            for estado in ("abiertas", "en_uso", "libres"):
+                conexiones.add_metric([estado] + self.valores, pool[estado])
+            yield conexiones
+            yield self._metrica(GaugeMetricFamily, "siglab_mysql_pool_limite", "Tamaño máximo del pool MySQL (base + desborde)",
+                                pool["tamano"] + pool["desborde"])
+            yield self._metrica(GaugeMetricFamily, "siglab_mysql_pool_esperando", "Hilos esperando una conexión", pool["esperando"])
+            yield self._metrica(CounterMetricFamily, "siglab_mysql_pool_prestamos", "Conexiones prestadas", pool["prestamos"])
+            yield self._metrica(CounterMetricFamily, "siglab_mysql_pool_timeouts", "Esperas de conexión que vencieron", pool["timeouts"])
+            yield self._metrica(CounterMetricFamily, "siglab_mysql_pool_espera_segundos", "Tiempo total esperando conexiones",
+                                pool["espera_total_s"])
+            yield self._metrica(GaugeMetricFamily, "siglab_mysql_pool_espera_maxima_segundos", "Espera más larga por una conexión",
+                                pool["espera_maxima_s"])
+            yield self._metrica(CounterMetricFamily, "siglab_mysql_pool_descartadas", "Conexiones cerradas por estar inservibles",
+                                pool["descartadas"])
+            yield self._metrica(CounterMetricFamily, "siglab_mysql_pool_recicladas", "Conexiones reabiertas por antigüedad",
+                                pool["recicladas"])
+
+        bcrypt = HashExecutor.estadisticas()
+        yield self._metrica(GaugeMetricFamily, "siglab_bcrypt_pendientes", "Operaciones de bcrypt en ejecución o en cola",
+                            bcrypt["pendientes"])
+        yield self._metrica(GaugeMetricFamily, "siglab_bcrypt_en_cola", "Operaciones de bcrypt esperando un proceso", bcrypt["en_cola"])
+        yield self._metrica(CounterMetricFamily, "siglab_bcrypt_completadas", "Operaciones de bcrypt completadas", bcrypt["completadas"])
+        yield self._metrica(CounterMetricFamily, "siglab_bcrypt_timeouts", "Operaciones de bcrypt rechazadas por timeout",
+                            bcrypt["timeouts"])
+
+        l1 = MaquinaService.estadisticas_l1()
+        yield self._metrica(GaugeMetricFamily, "siglab_cache_l1_entradas", "Entradas en la caché L1 del proceso", l1["entradas"])
+
+REGISTRY.register(_ColectorEstado())
@@ -0,0 +1,195 @@
+# Este archivo configura los logs del backend
+#   - Formato JSON (una línea por evento) para que se puedan procesar con herramientas
+#   - Los hilos que atienden peticiones solo encolan el evento; un hilo aparte escribe en stdout,
+#     así una consola lenta nunca frena al event loop ni a los hilos de BD
+#   - Nivel por módulo configurable con variables de entorno
+#   - Los eventos de caché (muy frecuentes) se registran por muestreo
+#   - Cada evento lleva el X-Request-ID que asigna nginx (o uno generado si no vino)
+#
+# Variables de entorno:
+#   LOG_LEVEL           nivel general (INFO)
+#   LOG_LEVELS          niveles por módulo, ej: "app.daos=WARNING,app.services.maquina_service=DEBUG"
+#   LOG_FORMAT          "json" (por defecto) o "texto"
+#   LOG_CACHE_SAMPLE    fracción de eventos de caché que se registran (0.01 = 1%)
+#   LOG_QUEUE_SIZE      eventos que pueden esperar en la cola antes de descartarse (10000)
+
+import os
+import sys
+import time
+import queue
+import random
+import logging
+import logging.handlers
+import contextvars
+import uuid
+from app.utils.serializacion import Serializador
+
+# Identificador de la petición en curso (se copia a los hilos del threadpool junto con el contexto)
+request_id = contextvars.ContextVar("request_id", default=None)
+
+# Atributos propios de LogRecord: todo lo demás vino en "extra" y se agrega al JSON
+_ATRIBUTOS_ESTANDAR = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+class FormateadorJSON(logging.Formatter):
+    def format(self, record) -> str:
+        evento = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            evento["request_id"] = record.request_id
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_ESTANDAR and clave != "request_id":
+                evento[clave] = valor
+        # Los eventos que pasan por la cola llegan con la traza ya formateada en exc_text
+        if record.exc_text:
+            evento["excepcion"] = record.exc_text
+        elif record.exc_info:
+            evento["excepcion"] = self.formatException(record.exc_info)
+        return Serializador.texto(evento)
+
+# Formateador del lado de la cola: solo resuelve "msg % args"; el formato final lo aplica el hilo escritor
+class _FormateadorMensaje(logging.Formatter):
+    def format(self, record) -> str:
+        return record.getMessage()
+
+# Handler de cola que no bloquea: si la cola está llena el evento se descarta y se cuenta
+class _ManejadorCola(logging.handlers.QueueHandler):
+    def __init__(self, cola):
+        super().__init__(cola)
+        self.descartados = 0
+        self.setFormatter(_FormateadorMensaje())
+
+    # Se ejecuta en el hilo que registra: captura el request id (el contexto no viaja al hilo escritor)
+    # y deja una copia del evento como la arma QueueHandler: mensaje resuelto, sin args ni exc_info,
+    # así el hilo escritor no lee objetos que la petición puede seguir modificando
+    # La traza se conserva como texto en exc_text para que el formateador la ponga en su propio campo
+    def prepare(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id.get()
+        traza = record.exc_text
+        if record.exc_info and not traza:
+            traza = self.formatter.formatException(record.exc_info)
+        registro = super().prepare(record)
+        registro.exc_text = traza
+        return registro
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.descartados += 1
+
+class Registro:
+    NIVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    NIVELES_MODULO = os.getenv("LOG_LEVELS", "")
+    FORMATO = os.getenv("LOG_FORMAT", "json").lower()
+    MUESTREO_CACHE = float(os.getenv("LOG_CACHE_SAMPLE", "0.01"))
+    TAMANO_COLA = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    _manejador = None
+    _escritor = None
+    _log_cache = logging.getLogger("app.cache")
+
+    # Instala la cola y el hilo escritor en el logger raíz (idempotente)
+    # También redirige los logs de uvicorn para que salgan con el mismo formato
+    @classmethod
+    def configurar(cls):
+        if cls._manejador is not None:
+            return
+
+        salida = logging.StreamHandler(sys.stdout)
+        if cls.FORMATO == "texto":
+            salida.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+        else:
+            salida.setFormatter(FormateadorJSON())
+
+        cola = queue.Queue(cls.TAMANO_COLA)
+        cls._manejador = _ManejadorCola(cola)
+        cls._escritor = logging.handlers.QueueListener(cola, salida, respect_handler_level=False)
+        cls._escritor.start()
+
+        raiz = logging.getLogger()
+        for manejador in list(raiz.handlers):
+            raiz.removeHandler(manejador)
+        raiz.addHandler(cls._manejador)
+        raiz.setLevel(cls.NIVEL)
+
+        for nombre in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            logger = logging.getLogger(nombre)
+            logger.handlers.clear()
+            logger.propagate = True
+
+        for nombre, nivel in cls._niveles_modulo().items():
+            logging.getLogger(nombre).setLevel(nivel)
+
+    # Vacía la cola y detiene el hilo escritor (se llama en el shutdown)
+    @classmethod
+    def cerrar(cls):
+        if cls._escritor is not None:
+            cls._escritor.stop()
+            logging.getLogger().removeHandler(cls._manejador)
+            cls._escritor = None
+            cls._manejador = None
+
+    # "modulo=NIVEL,modulo=NIVEL" -> {modulo: NIVEL}; las entradas mal escritas se ignoran
+    @classmethod
+    def _niveles_modulo(cls) -> dict:
+        niveles = {}
+        for entrada in cls.NIVELES_MODULO.split(","):
+            nombre, _, nivel = entrada.partition("=")
+            nivel = nivel.strip().upper()
+            if nombre.strip() and isinstance(logging.getLevelName(nivel), int):
+                niveles[nombre.strip()] = nivel
+        return niveles
+
+    # Registra un acierto o fallo de caché solo para una fracción de los eventos
+    # El sorteo se hace antes de crear el evento: los descartados casi no cuestan
+    @classmethod
+    def cache(cls, nivel: str, familia: str, acierto: bool):
+        if cls.MUESTREO_CACHE <= 0 or random.random() >= cls.MUESTREO_CACHE:
+            return
+        if cls._log_cache.isEnabledFor(logging.INFO):
+            cls._log_cache.info(
+                "Caché %s %s", nivel, "acierto" if acierto else "fallo",
+                extra={"nivel_cache": nivel, "familia": familia, "acierto": acierto, "muestreo": cls.MUESTREO_CACHE}
+            )
+
+    # Eventos descartados por cola llena
+    @classmethod
+    def estadisticas(cls) -> dict:
+        return {"descartados": cls._manejador.descartados if cls._manejador else 0}
+
+# Middleware ASGI: toma el X-Request-ID de nginx (o genera uno) y lo devuelve en la respuesta
+class RequestIdMiddleware:
+    CABECERA = b"x-request-id"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        valor = None
+        for nombre, contenido in scope["headers"]:
+            if nombre == self.CABECERA:
+                valor = contenido.decode("latin-1")[:64]
+                break
+        if not valor:
+            valor = uuid.uuid4().hex
+        token = request_id.set(valor)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje.setdefault("headers", [])
+                mensaje["headers"] = list(mensaje["headers"]) + [(self.CABECERA, valor.encode("latin-1"))]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            request_id.reset(token)
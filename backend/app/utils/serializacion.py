@@ -0,0 +1,60 @@
+# Este archivo centraliza la serialización JSON de las respuestas y de la caché
+# Usa orjson si está instalado (mucho más rápido que json) y si no cae a la librería estándar
+# Los tipos que llegan de las bases (ObjectId de MongoDB, date de MySQL, Decimal) se convierten aquí,
+# así los services no necesitan recorrer los resultados para pasarlos a texto
+
+import json
+import datetime
+from decimal import Decimal
+from bson import ObjectId
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class Serializador:
+    # Conversión de los tipos que el serializador no conoce
+    @staticmethod
+    def _por_defecto(valor):
+        if isinstance(valor, ObjectId):
+            return str(valor)
+        if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+            return valor.isoformat()
+        if isinstance(valor, Decimal):
+            return float(valor)
+        if isinstance(valor, (set, frozenset)):
+            return list(valor)
+        raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+    # Objeto -> bytes JSON (UTF-8)
+    @classmethod
+    def dumps(cls, valor) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(valor, default=cls._por_defecto, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(valor, default=cls._por_defecto, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    # Objeto -> texto JSON (para guardar en Redis)
+    @classmethod
+    def texto(cls, valor) -> str:
+        return cls.dumps(valor).decode("utf-8")
+
+    # bytes/texto JSON -> objeto
+    @staticmethod
+    def loads(datos):
+        if orjson is not None:
+            return orjson.loads(datos)
+        return json.loads(datos)
+
+# Respuesta por defecto de la aplicación: serializa con Serializador en lugar de json
+# Si se devuelve directamente desde la ruta, FastAPI además se salta jsonable_encoder
+class RespuestaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return Serializador.dumps(content)
+
+# Respuesta para contenido que ya es JSON (por ejemplo, el listado armado desde Redis)
+class RespuestaJSONSerializada(Response):
+    media_type = "application/json"
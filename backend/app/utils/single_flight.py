@@ -0,0 +1,48 @@
+# Este archivo agrupa llamadas concurrentes iguales dentro del mismo proceso
+# Si varios hilos piden la misma clave a la vez, solo el primero ejecuta la carga
+# y el resto espera y recibe el mismo resultado (evita estampidas contra MySQL)
+
+import threading
+
+class _Llamada:
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo = {}
+
+    # Indica si ya hay una carga en curso para la clave
+    def en_curso(self, clave: str) -> bool:
+        with self._lock:
+            return clave in self._en_vuelo
+
+    # Ejecuta la función una sola vez por clave entre todos los hilos concurrentes
+    def ejecutar(self, clave: str, funcion):
+        with self._lock:
+            llamada = self._en_vuelo.get(clave)
+            lider = llamada is None
+            if lider:
+                llamada = _Llamada()
+                self._en_vuelo[clave] = llamada
+
+        # Los seguidores esperan el resultado del líder
+        if not lider:
+            llamada.evento.wait()
+            if llamada.error is not None:
+                raise llamada.error
+            return llamada.resultado
+
+        try:
+            llamada.resultado = funcion()
+            return llamada.resultado
+        except Exception as e:
+            llamada.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_vuelo[clave]
+            llamada.evento.set()
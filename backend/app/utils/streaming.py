@@ -0,0 +1,56 @@
+# Este archivo arma respuestas NDJSON (un objeto JSON por línea) a partir de generadores
+# El cliente empieza a recibir filas enseguida y el backend solo tiene en memoria un bloque a la vez
+# Cada bloque se lee y serializa en un hilo del limitador de Concurrencia (los drivers bloquean)
+
+import os
+import anyio
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from app.utils.concurrencia import Concurrencia
+from app.utils.serializacion import Serializador
+
+class RespuestaStreaming:
+    TIPO_NDJSON = "application/x-ndjson"
+    # Objetos por bloque enviado (y por viaje al hilo de BD)
+    TAMANO_LOTE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+    # El cliente pide streaming con "Accept: application/x-ndjson" o con ?stream=1
+    @classmethod
+    def solicitado(cls, request: Request, stream: bool = False) -> bool:
+        return stream or cls.TIPO_NDJSON in request.headers.get("accept", "")
+
+    # Serializa hasta "cantidad" elementos del iterador y devuelve (bytes, terminado)
+    # Como el estado 200 ya se envió, un error a mitad de camino se informa con una última línea {"error": ...}
+    @staticmethod
+    def _siguiente_bloque(iterador, cantidad: int) -> tuple:
+        lineas = []
+        terminado = True
+        try:
+            for elemento in iterador:
+                lineas.append(Serializador.dumps(elemento))
+                if len(lineas) >= cantidad:
+                    terminado = False
+                    break
+        except Exception as e:
+            lineas.append(Serializador.dumps({"error": str(e)}))
+        return b"\n".join(lineas) + b"\n" if lineas else b"", terminado
+
+    # Respuesta NDJSON alimentada por un generador síncrono (por ejemplo, un cursor de MySQL)
+    @classmethod
+    def ndjson(cls, elementos) -> StreamingResponse:
+        iterador = iter(elementos)
+
+        async def cuerpo():
+            try:
+                terminado = False
+                while not terminado:
+                    bloque, terminado = await Concurrencia.ejecutar(cls._siguiente_bloque, iterador, cls.TAMANO_LOTE)
+                    if bloque:
+                        yield bloque
+            finally:
+                # Cierra el generador (y su cursor) también si el cliente se desconectó
+                if hasattr(iterador, "close"):
+                    with anyio.CancelScope(shield=True):
+                        await Concurrencia.ejecutar(iterador.close)
+
+        return StreamingResponse(cuerpo(), media_type=cls.TIPO_NDJSON, headers={"X-Accel-Buffering": "no"})
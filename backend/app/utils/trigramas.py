@@ -0,0 +1,13 @@
+# Este archivo genera los trigramas usados por el índice de búsqueda parcial de códigos
+# Un texto contiene "abc" solo si contiene todos sus trigramas: así la búsqueda
+# por subcadena se resuelve con el índice en lugar de recorrer toda la tabla
+
+class Trigramas:
+    # Longitud mínima de término que puede resolverse con el índice
+    LONGITUD = 3
+
+    # Devuelve el conjunto de trigramas del texto normalizado (minúsculas, sin espacios en los extremos)
+    @staticmethod
+    def generar(texto: str) -> set:
+        texto = str(texto).strip().lower()
+        return {texto[i:i + Trigramas.LONGITUD] for i in range(len(texto) - Trigramas.LONGITUD + 1)}
@@ -0,0 +1,52 @@
+# Configuración de Gunicorn - Servidor de producción con varios workers uvicorn por contenedor
+# Uso: gunicorn main:app -c gunicorn.conf.py
+#   - Un worker por núcleo disponible (WEB_CONCURRENCY para fijarlo)
+#   - La aplicación NO se precarga en el proceso maestro: cada worker importa main.py después del fork,
+#     así los pools de MySQL, MongoDB y Redis, la caché L1 y los hilos de fondo son propios de cada worker
+#   - kill -HUP <pid del maestro> recarga sin cortar: arranca workers nuevos y los viejos terminan sus peticiones
+#   - Métricas Prometheus compartidas entre workers en PROMETHEUS_MULTIPROC_DIR
+
+import os
+import shutil
+
+# Núcleos que puede usar este contenedor (respeta cpuset/afinidad, no solo los del host)
+def _nucleos() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(_nucleos())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = False
+
+# Los workers heredan el entorno: el pool MySQL y el pool de bcrypt se dimensionan con este valor
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Segundos sin respuesta antes de reiniciar un worker colgado
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Segundos que un worker tiene para terminar sus peticiones al apagar o recargar
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "20"))
+# Keep-alive con nginx (mayor que el de nginx para que sea nginx quien cierre)
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+
+# Los logs de acceso y de la aplicación los emite uvicorn a través de Registro (JSON por stdout)
+accesslog = None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+# Directorio de las métricas compartidas; debe existir antes de que los workers importen prometheus_client
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/siglab_prometheus")
+
+# Al arrancar el maestro: se vacía el directorio de métricas (los archivos de una ejecución anterior sumarían)
+def on_starting(server):
+    directorio = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.makedirs(directorio, exist_ok=True)
+    server.log.info(f"Iniciando {workers} workers (núcleos disponibles: {_nucleos()})")
+
+# Un worker terminó (recarga, reinicio por timeout o caída): sus gauges dejan de contarse
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -3,8 +3,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
-from app.routes import maquina, mantenimiento, auth 
+from app.utils.registro import Registro, RequestIdMiddleware
+
+# Logs JSON por cola: se configuran antes de importar el resto para capturar todo (también los de uvicorn)
+Registro.configurar()
+
+from app.routes import maquina, mantenimiento, auth, sistema
 from app.database.database_manager import DatabaseManager
+from app.utils.hash_executor import HashExecutor
+from app.services.maquina_service import MaquinaService
+from app.utils.serializacion import RespuestaJSON
+from app.utils.metricas import MetricasMiddleware
 
 # Middleware para headers de proxy (Nginx)
 class ProxyHeadersMiddleware(BaseHTTPMiddleware):
@@ -22,24 +31,37 @@ class ProxyHeadersMiddleware(BaseHTTPMiddleware):
         response = await call_next(request)
         return response
 
-# Aplicación FastAPI
-app = FastAPI()
+# Aplicación FastAPI (las respuestas se serializan con orjson si está instalado)
+app = FastAPI(default_response_class=RespuestaJSON)
 
 # Middlewares
 app.add_middleware(ProxyHeadersMiddleware)
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
+# Métricas (el último agregado es el más externo: mide también a los otros middlewares)
+app.add_middleware(MetricasMiddleware)
+# X-Request-ID: el más externo, así todos los logs de la petición llevan su identificador
+app.add_middleware(RequestIdMiddleware)
 
 # Evento startup - Inicializar BD
 @app.on_event("startup")
 def startup_db_client():
     DatabaseManager.inicializar()
+    # Escuchar invalidaciones de caché L1 publicadas por los otros backends
+    MaquinaService.iniciar_invalidaciones()
 
 # Evento shutdown - Cerrar conexiones
 @app.on_event("shutdown")
 def shutdown_db_client():
+    MaquinaService.detener_invalidaciones()
     DatabaseManager.cerrar()
+    # Cerrar el pool de procesos de bcrypt
+    HashExecutor.cerrar()
+    # Escribir los logs pendientes
+    Registro.cerrar()
 
 # Registro de rutas
 app.include_router(maquina.router)        # /api/maquinas/*
 app.include_router(mantenimiento.router)  # /api/mantenimiento/*
 app.include_router(auth.router)           # /api/auth/*
+app.include_router(sistema.router)        # /api/sistema/*
+app.include_router(sistema.router_raiz)   # /metrics
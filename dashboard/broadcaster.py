@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Difusión de actualizaciones a los clientes WebSocket del dashboard
+
+- Los cambios se acumulan y se envían en cuadros cada FRAME_INTERVAL (100 ms),
+  con solo los valores que cambiaron (delta), serializados una vez para todos
+- Cada cliente tiene una cola acotada y su propia tarea de envío: un cliente lento
+  no frena a los demás ni a la lectura del log
+- Si la cola de un cliente se llena, se descartan sus cuadros pendientes y se le
+  envía una foto completa del estado (los deltas perdidos quedan incluidos en ella)
+"""
+
+import asyncio
+import json
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Client:
+    """Cola y tarea de envío de un cliente WebSocket"""
+
+    def __init__(self, ws, queue_size):
+        self.ws = ws
+        self.queue = asyncio.Queue(queue_size)
+        self.task = None
+        self.dropped = 0
+
+
+class Broadcaster:
+    FRAME_INTERVAL = float(os.getenv('DASHBOARD_FRAME_MS', '100')) / 1000
+    QUEUE_SIZE = int(os.getenv('DASHBOARD_CLIENT_QUEUE', '32'))
+    SEND_TIMEOUT = float(os.getenv('DASHBOARD_SEND_TIMEOUT', '5'))
+
+    def __init__(self, snapshot, total):
+        # snapshot(): dict con el estado completo (se envía al conectar y al desbordar una cola)
+        # total(): total de peticiones exitosas (va en cada cuadro)
+        self.snapshot = snapshot
+        self.total = total
+        self.clients = {}
+        self._stats = {}
+        self._health = {}
+        self._routes = {}
+        self._events = []
+        self._requests = 0
+        self._errors = 0
+        self._last_status = None
+        self._windows = None
+        self._seq = 0
+
+    # --- Registro de cambios (síncrono, se llama por cada línea del log) ---
+
+    def server_changed(self, server_name, count, health):
+        self._stats[server_name] = count
+        self._health[server_name] = health
+
+    def route_changed(self, route_key, route):
+        self._routes[route_key] = route
+
+    def request(self, status):
+        self._requests += 1
+        self._last_status = status
+        if status >= 400:
+            self._errors += 1
+
+    def event(self, name, **data):
+        data['event'] = name
+        self._events.append(data)
+
+    def windows(self, summary, last_second, probes=None):
+        """Resumen por ventanas (1s/10s/1m/5m), peticiones del último segundo por servidor
+        y última verificación activa de cada uno"""
+        self._windows = {'summary': summary, 'last_second': last_second, 'probes': probes or {}}
+
+    def reset(self):
+        """Descarta los cambios pendientes y envía una foto completa marcada como reset"""
+        self._clear()
+        message = self.snapshot()
+        message['reset'] = True
+        self._send_all(self._encode('snapshot', message))
+
+    # --- Clientes ---
+
+    async def register(self, ws):
+        client = _Client(ws, self.QUEUE_SIZE)
+        self.clients[ws] = client
+        client.queue.put_nowait(self._encode('snapshot', self.snapshot()))
+        client.task = asyncio.create_task(self._sender(client))
+        return client
+
+    async def unregister(self, ws):
+        client = self.clients.pop(ws, None)
+        if client is not None and client.task is not None:
+            client.task.cancel()
+
+    async def _sender(self, client):
+        """Envía los cuadros de un cliente en orden; si se traba o falla, se cierra"""
+        try:
+            while True:
+                message = await client.queue.get()
+                await asyncio.wait_for(client.ws.send_str(message), self.SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Cliente lento o desconectado, se cierra: {e}")
+            self.clients.pop(client.ws, None)
+            await client.ws.close()
+
+    # --- Cuadros ---
+
+    async def run(self):
+        """Arma y envía un cuadro cada FRAME_INTERVAL mientras haya cambios"""
+        while True:
+            await asyncio.sleep(self.FRAME_INTERVAL)
+            if not (self._stats or self._health or self._routes or self._events or self._requests or self._windows):
+                continue
+            frame = {
+                'stats': self._stats,
+                'health': self._health,
+                'routes': self._routes,
+                'events': self._events,
+                'requests': self._requests,
+                'errors': self._errors,
+                'last_status': self._last_status,
+            }
+            if self._windows is not None:
+                frame['windows'] = self._windows
+            frame['total_requests'] = self.total()
+            self._clear()
+            if self.clients:
+                self._send_all(self._encode('delta', frame))
+
+    def _clear(self):
+        self._stats = {}
+        self._health = {}
+        self._routes = {}
+        self._events = []
+        self._requests = 0
+        self._errors = 0
+        self._last_status = None
+        self._windows = None
+
+    def _encode(self, kind, data):
+        self._seq += 1
+        data['type'] = kind
+        data['seq'] = self._seq
+        data['timestamp'] = time.time()
+        return json.dumps(data)
+
+    def _send_all(self, message):
+        snapshot = None
+        for client in self.clients.values():
+            try:
+                client.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Cliente atrasado: se reemplaza todo lo pendiente por una foto completa
+                client.dropped += client.queue.qsize()
+                while not client.queue.empty():
+                    client.queue.get_nowait()
+                if snapshot is None:
+                    snapshot = self._encode('snapshot', self.snapshot())
+                client.queue.put_nowait(snapshot)
+
+    def stats(self):
+        return {
+            'clients': len(self.clients),
+            'queued': sum(c.queue.qsize() for c in self.clients.values()),
+            'dropped': sum(c.dropped for c in self.clients.values()),
+        }
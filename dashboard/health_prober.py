@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Verificación activa de la salud de los backends
+
+En lugar de deducir que un backend murió porque no aparece en el log (lo que marca
+como caído a un servidor sano pero sin tráfico, por ejemplo con balanceo hash o por
+pesos), se consulta su endpoint /health en paralelo cada HEALTH_INTERVAL segundos
+(con una variación aleatoria para no sincronizar las consultas).
+
+- Un servidor pasa a caído tras HEALTH_FAILURES fallos seguidos y vuelve a estar
+  vivo tras HEALTH_SUCCESSES respuestas seguidas (evita falsos positivos por un
+  solo timeout)
+- Se guarda la latencia de cada verificación (última y promedio móvil) y el estado
+  de MySQL, MongoDB y Redis que informa el backend
+- Los backends se toman de HEALTH_TARGETS (host:puerto) y de los upstreams que
+  aparecen en el log; las direcciones se resuelven a IP para coincidir con el log
+"""
+
+import asyncio
+import os
+import random
+import socket
+import time
+import logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeState:
+    """Estado de las verificaciones de un backend"""
+
+    def __init__(self, address):
+        self.address = address
+        self.healthy = None  # None hasta la primera decisión
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.latency_ms = None
+        self.latency_avg_ms = None
+        self.last_check = None
+        self.last_error = None
+        self.backend_state = None  # "ok" / "degradado" / "caido" según el propio backend
+        self.dependencies = {}
+
+    def to_dict(self):
+        return {
+            'address': self.address,
+            'healthy': self.healthy,
+            'consecutive_failures': self.consecutive_failures,
+            'latency_ms': self.latency_ms,
+            'latency_avg_ms': self.latency_avg_ms,
+            'last_check': self.last_check,
+            'last_error': self.last_error,
+            'backend_state': self.backend_state,
+            'dependencies': self.dependencies,
+        }
+
+
+class HealthProber:
+    INTERVAL = float(os.getenv('HEALTH_INTERVAL', '0.5'))
+    JITTER = float(os.getenv('HEALTH_JITTER', '0.1'))
+    TIMEOUT = float(os.getenv('HEALTH_PROBE_TIMEOUT', '0.8'))
+    FAILURES = int(os.getenv('HEALTH_FAILURES', '2'))
+    SUCCESSES = int(os.getenv('HEALTH_SUCCESSES', '2'))
+    PATH = os.getenv('HEALTH_PATH', '/health')
+    TARGETS = [t.strip() for t in os.getenv('HEALTH_TARGETS', '').split(',') if t.strip()]
+    # Peso de la última medición en el promedio móvil de latencia
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, on_down, on_up, known_upstreams):
+        # on_down(address) / on_up(address): cambios de estado confirmados
+        # known_upstreams(): direcciones ip:puerto vistas en el log
+        self.on_down = on_down
+        self.on_up = on_up
+        self.known_upstreams = known_upstreams
+        self.states = {}
+        self._resolved = {}  # host:puerto configurado -> última ip:puerto conocida
+
+    @classmethod
+    def enabled(cls):
+        return os.getenv('HEALTH_CHECKS', '1') != '0'
+
+    async def run(self):
+        timeout = aiohttp.ClientTimeout(total=self.TIMEOUT)
+        # Conexiones persistentes por backend: la verificación no paga el handshake TCP
+        connector = aiohttp.TCPConnector(limit=0, keepalive_timeout=30)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            logger.info(f"Verificación activa cada {self.INTERVAL}s (±{self.JITTER}s) de: "
+                        f"{', '.join(self.TARGETS) or 'upstreams del log'}")
+            while True:
+                try:
+                    addresses = await self._targets()
+                    if addresses:
+                        await asyncio.gather(*(self._probe(session, address) for address in addresses))
+                except Exception as e:
+                    # Un error inesperado no debe detener la verificación de todos los backends
+                    logger.error(f"Error en la verificación activa: {e}")
+                await asyncio.sleep(self.INTERVAL + random.uniform(-self.JITTER, self.JITTER))
+
+    async def _targets(self):
+        """Direcciones ip:puerto a verificar (configuradas y vistas en el log)"""
+        addresses = set(self.known_upstreams())
+        loop = asyncio.get_running_loop()
+        for target in self.TARGETS:
+            host, _, port = target.rpartition(':')
+            try:
+                info = await asyncio.wait_for(
+                    loop.getaddrinfo(host, int(port), family=socket.AF_INET, type=socket.SOCK_STREAM),
+                    self.TIMEOUT
+                )
+                self._resolved[target] = f"{info[0][4][0]}:{port}"
+            except (OSError, asyncio.TimeoutError, ValueError):
+                # Con el contenedor detenido su nombre deja de resolver: se sigue verificando la última IP
+                pass
+            if target in self._resolved:
+                addresses.add(self._resolved[target])
+        return addresses
+
+    async def _probe(self, session, address):
+        state = self.states.get(address)
+        if state is None:
+            state = self.states[address] = ProbeState(address)
+
+        start = time.perf_counter()
+        ok = False
+        try:
+            async with session.get(f"http://{address}{self.PATH}") as response:
+                body = await response.json(content_type=None)
+                # 200 = ok o degradado (el backend sigue atendiendo); 503 = ninguna base responde
+                ok = response.status == 200
+                state.backend_state = body.get('estado')
+                state.dependencies = {
+                    name: dep.get('ok') for name, dep in (body.get('dependencias') or {}).items()
+                }
+                state.last_error = None if ok else f"HTTP {response.status}"
+        except Exception as e:
+            state.last_error = str(e) or type(e).__name__
+            state.backend_state = None
+
+        elapsed = round((time.perf_counter() - start) * 1000, 2)
+        state.last_check = time.time()
+        if ok:
+            state.latency_ms = elapsed
+            state.latency_avg_ms = elapsed if state.latency_avg_ms is None else round(
+                self.EWMA_ALPHA * elapsed + (1 - self.EWMA_ALPHA) * state.latency_avg_ms, 2)
+            state.consecutive_successes += 1
+            state.consecutive_failures = 0
+            if state.healthy is not True and (state.healthy is None or state.consecutive_successes >= self.SUCCESSES):
+                state.healthy = True
+                self._notify(self.on_up, address)
+        else:
+            state.consecutive_failures += 1
+            state.consecutive_successes = 0
+            if state.healthy is not False and state.consecutive_failures >= self.FAILURES:
+                state.healthy = False
+                logger.info(f"Verificación fallida {state.consecutive_failures} veces: {address} ({state.last_error})")
+                self._notify(self.on_down, address)
+
+    def _notify(self, callback, address):
+        """Avisa un cambio de estado; un error del callback no afecta al resto de las verificaciones"""
+        try:
+            callback(address)
+        except Exception as e:
+            logger.error(f"Error al notificar el estado de {address}: {e}")
+
+    def mark_failed(self, address):
+        """Fallo detectado por otra vía (error de conexión en el log): se exige recuperarse de nuevo"""
+        state = self.states.get(address)
+        if state is None:
+            state = self.states[address] = ProbeState(address)
+        state.healthy = False
+        state.consecutive_successes = 0
+
+    def summary(self):
+        return {address: state.to_dict() for address, state in self.states.items()}
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Lectura en tiempo real del log de balanceo de nginx
+
+- Se despierta con inotify (Linux) cuando el archivo cambia; si inotify no está
+  disponible revisa el archivo cada POLL_INTERVAL segundos
+- Lee en bloques grandes y entrega lotes de líneas completas
+- Soporta logrotate: rotación por renombrado (se termina de leer el archivo viejo
+  y se abre el nuevo desde el principio) y por truncado (copytruncate)
+- Parser de una sola pasada con patrones precompilados para líneas de acceso y de error
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import os
+import re
+import struct
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Petición atendida (formato "balanceo" de nginx)
+# request_time: $request_time (None en logs con el formato anterior)
+# attempts: un UpstreamAttempt por cada upstream probado (varios si nginx reintentó)
+AccessEntry = namedtuple('AccessEntry', 'upstream method route status bytes_sent request_time attempts')
+# Un intento contra un upstream: dirección, $upstream_status, $upstream_response_time, $upstream_connect_time
+UpstreamAttempt = namedtuple('UpstreamAttempt', 'upstream status response_time connect_time')
+# Error de conexión con un upstream (líneas de error_log)
+UpstreamError = namedtuple('UpstreamError', 'upstream reason')
+
+
+class LogParser:
+    """Convierte líneas del log de balanceo en AccessEntry / UpstreamError"""
+
+    # $upstream_addr - $remote_user [$time_local] "$request" $status $body_bytes_sent "..."
+    #   rt=$request_time uct="$upstream_connect_time" urt="$upstream_response_time" us="$upstream_status"
+    # Las variables $upstream_* traen un valor por intento ("a:8000, b:8000") cuando nginx reintenta,
+    # y grupos separados por " : " si hubo redirección interna. Los tiempos son opcionales para
+    # seguir leyendo logs escritos con el formato anterior
+    ACCESS_RE = re.compile(
+        r'(?P<upstream>\S[^\[]*?) - \S+ \[[^\]]*\] '
+        r'"(?P<method>[A-Z]+) (?P<uri>\S+)[^"]*" (?P<status>\d{3}) (?P<bytes>\d+)'
+        r'(?: "[^"]*")?'
+        r'(?: rt=(?P<rt>[\d.]+) uct="(?P<uct>[^"]*)" urt="(?P<urt>[^"]*)" us="(?P<us>[^"]*)")?'
+    )
+    SEPARATOR_RE = re.compile(r'\s*,\s*|\s+:\s+')
+    # Dirección de un servidor (ip:puerto, [ipv6]:puerto o nombre:puerto). Sin servidor vivo nginx deja
+    # el nombre del grupo upstream (sin puerto) en $upstream_addr; eso no es un servidor
+    ADDRESS_RE = re.compile(r'(?:\[[0-9A-Fa-f:.]+\]|[^\s:/\[\]]+):\d+')
+    # 2026/01/01 10:00:00 [error] 1#1: *5 connect() failed (111: Connection refused) while connecting
+    # to upstream, client: ..., upstream: "http://172.18.0.4:8000/api/...", host: ...
+    ERROR_RE = re.compile(
+        r'\d{4}/\d\d/\d\d \d\d:\d\d:\d\d \[(?:error|warn|crit|alert|emerg)\] '
+        r'.*?(?P<reason>failed|timed out|refused|no live upstreams|reset by peer|prematurely closed)'
+        r'.*?upstream: "[a-z]+://(?P<upstream>[^/"]+)',
+        re.IGNORECASE
+    )
+
+    # Rutas con parámetros: se agrupan por plantilla para no crear una serie por código de máquina
+    ROUTE_TEMPLATES = [
+        (re.compile(r'^/api/maquinas/eliminar/[^/]+$'), '/api/maquinas/eliminar/{codigo}'),
+        (re.compile(r'^/api/mantenimiento/listar/[^/]+$'), '/api/mantenimiento/listar/{codigo}'),
+    ]
+
+    def __init__(self, prefix='/api/'):
+        self.prefix = prefix
+        self._routes = {}  # caché de ruta cruda -> plantilla
+
+    def normalize_route(self, uri):
+        """Quita la query string y reemplaza los parámetros de ruta por su plantilla"""
+        path = uri.split('?', 1)[0]
+        route = self._routes.get(path)
+        if route is None:
+            route = path
+            for pattern, template in self.ROUTE_TEMPLATES:
+                if pattern.match(path):
+                    route = template
+                    break
+            # Límite para que URLs arbitrarias no hagan crecer la caché sin fin
+            if len(self._routes) < 10000:
+                self._routes[path] = route
+        return route
+
+    def parse(self, line):
+        """Devuelve AccessEntry, UpstreamError o None si la línea no interesa"""
+        match = self.ACCESS_RE.match(line)
+        if match is not None:
+            uri = match.group('uri')
+            if not uri.startswith(self.prefix):
+                return None
+            addresses = self.SEPARATOR_RE.split(match.group('upstream').strip())
+            rt = match.group('rt')
+            return AccessEntry(
+                # La última dirección es la que respondió; las anteriores fallaron y nginx reintentó
+                # ("-" si no respondió ningún servidor: caché, error de nginx o grupo sin servidores vivos)
+                addresses[-1] if self.is_address(addresses[-1]) else '-',
+                match.group('method'),
+                self.normalize_route(uri),
+                int(match.group('status')),
+                int(match.group('bytes')),
+                float(rt) if rt else None,
+                self._attempts(addresses, match) if rt else ()
+            )
+
+        match = self.ERROR_RE.match(line)
+        if match is not None and self.is_address(match.group('upstream')):
+            return UpstreamError(match.group('upstream'), match.group('reason').lower())
+        return None
+
+    @classmethod
+    def is_address(cls, address):
+        """True si es la dirección de un servidor (descarta "-", "unix:" y nombres de grupo)"""
+        return cls.ADDRESS_RE.fullmatch(address) is not None
+
+
+    def _attempts(self, addresses, match):
+        """Combina las listas de $upstream_* en un UpstreamAttempt por intento"""
+        statuses = self.SEPARATOR_RE.split(match.group('us'))
+        response_times = self.SEPARATOR_RE.split(match.group('urt'))
+        connect_times = self.SEPARATOR_RE.split(match.group('uct'))
+        attempts = []
+        for i, address in enumerate(addresses):
+            if not self.is_address(address):
+                continue
+            attempts.append(UpstreamAttempt(
+                address,
+                _number(statuses, i, int),
+                _number(response_times, i, float),
+                _number(connect_times, i, float)
+            ))
+        return attempts
+
+
+def _number(values, i, kind):
+    """Valor i de una lista de nginx; None si falta o es "-" """
+    if i >= len(values):
+        return None
+    try:
+        return kind(values[i])
+    except ValueError:
+        return None
+
+
+class _Inotify:
+    """Envoltorio mínimo de inotify con ctypes (sin dependencias externas)"""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 falló')
+
+    def add_watch(self, path, mask):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Lee los eventos pendientes: lista de (wd, mask, nombre)"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+                offset += length
+                events.append((wd, mask, name))
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogTailer:
+    """Sigue un archivo de log y entrega lotes de líneas nuevas"""
+
+    CHUNK_SIZE = int(os.getenv('LOG_CHUNK_SIZE', str(256 * 1024)))
+    POLL_INTERVAL = float(os.getenv('LOG_POLL_INTERVAL', '0.25'))
+    # Aunque haya inotify, revisar cada tanto (por si se pierde un evento o el volumen no lo soporta)
+    SAFETY_INTERVAL = 1.0
+
+    def __init__(self, path, from_end=True):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path)) or '.'
+        self.filename = os.path.basename(path)
+        self.from_end = from_end
+        self._fd = None
+        self._inode = None
+        self._offset = 0
+        self._partial = b''
+        self._wakeup = asyncio.Event()
+        self._inotify = None
+        self._file_wd = None
+        self.mode = 'polling'
+
+    async def lines(self):
+        """Generador asíncrono de lotes (listas) de líneas decodificadas"""
+        while not os.path.exists(self.path):
+            logger.info(f"Esperando archivo de log: {self.path}")
+            await asyncio.sleep(2)
+
+        self._open(seek_end=self.from_end)
+        self._start_inotify()
+        logger.info(f"Monitoreando log: {self.path} (modo {self.mode})")
+
+        try:
+            while True:
+                batch = self._read_available()
+                if batch:
+                    yield batch
+                    # Puede haber más: seguir leyendo, pero dejando correr a las demás tareas
+                    await asyncio.sleep(0)
+                    continue
+                self._check_rotation()
+                await self._wait()
+        finally:
+            self.close()
+
+    def close(self):
+        loop = asyncio.get_event_loop()
+        if self._inotify is not None:
+            loop.remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _open(self, seek_end):
+        fd = os.open(self.path, os.O_RDONLY)
+        stat = os.fstat(fd)
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = fd
+        self._inode = (stat.st_dev, stat.st_ino)
+        self._offset = stat.st_size if seek_end else 0
+        self._partial = b''
+        if self._inotify is not None:
+            self._watch_file()
+
+    def _read_available(self):
+        """Lee hasta CHUNK_SIZE bytes y devuelve las líneas completas"""
+        try:
+            data = os.pread(self._fd, self.CHUNK_SIZE, self._offset)
+        except OSError as e:
+            logger.error(f"Error leyendo log: {e}")
+            return []
+        if not data:
+            return []
+        self._offset += len(data)
+
+        data = self._partial + data
+        cut = data.rfind(b'\n')
+        if cut < 0:
+            self._partial = data
+            return []
+        self._partial = data[cut + 1:]
+        return data[:cut].decode('utf-8', 'replace').splitlines()
+
+    def _check_rotation(self):
+        """Detecta truncado (copytruncate) y renombrado (rotación clásica)"""
+        try:
+            size = os.fstat(self._fd).st_size
+        except OSError:
+            size = self._offset
+        if size < self._offset:
+            logger.info(f"Log truncado, se vuelve a leer desde el inicio: {self.path}")
+            self._offset = 0
+            self._partial = b''
+            return
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # Renombrado y todavía sin archivo nuevo: seguir con el viejo hasta que aparezca
+            return
+        if (stat.st_dev, stat.st_ino) != self._inode:
+            # El archivo viejo ya se leyó completo (_read_available devolvió vacío)
+            logger.info(f"Log rotado, abriendo archivo nuevo: {self.path}")
+            self._open(seek_end=False)
+
+    def _start_inotify(self):
+        try:
+            self._inotify = _Inotify()
+            # El directorio solo avisa creaciones y renombrados (no cada escritura de otros logs)
+            self._inotify.add_watch(self.directory, _Inotify.IN_CREATE | _Inotify.IN_MOVED_TO)
+            self._watch_file()
+            asyncio.get_event_loop().add_reader(self._inotify.fd, self._on_inotify)
+            self.mode = 'inotify'
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify no disponible ({e}); se usa sondeo cada {self.POLL_INTERVAL}s")
+            if self._inotify is not None:
+                self._inotify.close()
+            self._inotify = None
+            self.mode = 'polling'
+
+    def _watch_file(self):
+        if self._file_wd is not None:
+            self._inotify.rm_watch(self._file_wd)
+        self._file_wd = self._inotify.add_watch(
+            self.path,
+            _Inotify.IN_MODIFY | _Inotify.IN_ATTRIB | _Inotify.IN_MOVE_SELF | _Inotify.IN_DELETE_SELF
+        )
+
+    def _on_inotify(self):
+        try:
+            events = self._inotify.read_events()
+        except OSError as e:
+            logger.error(f"Error leyendo eventos inotify: {e}")
+            events = [None]
+        if events:
+            self._wakeup.set()
+
+    async def _wait(self):
+        timeout = self.SAFETY_INTERVAL if self._inotify is not None else self.POLL_INTERVAL
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
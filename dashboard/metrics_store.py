@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Métricas por ventanas de tiempo con memoria acotada
+
+Cada upstream (y el total) tiene un anillo de cubetas de un segundo que cubre la
+ventana más larga (5 minutos). Una cubeta guarda el conteo de peticiones, la mezcla
+de códigos de estado (1xx..5xx), la latencia y un histograma logarítmico de latencias
+(estilo HDR) del que se sacan los percentiles p50/p95/p99 de cada ventana.
+Las cubetas se reutilizan al dar la vuelta, así que la memoria no crece con la
+duración de la prueba y los datos siguen disponibles aunque haya períodos sin tráfico.
+"""
+
+import math
+import time
+
+# Ventanas publicadas: nombre -> segundos
+WINDOWS = {'1s': 1, '10s': 10, '1m': 60, '5m': 300}
+
+
+class LatencyHistogram:
+    """Histograma logarítmico: cada cubeta es ~2% más ancha que la anterior (error relativo ≤ 1%)
+
+    Se guarda disperso ({índice: conteo}) porque en un segundo las latencias se concentran
+    en pocas cubetas; combinar ventanas cuesta lo mismo que las cubetas usadas.
+    """
+
+    MIN = 0.0001  # 0,1 ms: todo lo menor cae en la primera cubeta
+    GROWTH = 1.02
+    _LOG_GROWTH = math.log(GROWTH)
+    PERCENTILES = (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+
+    @classmethod
+    def index(cls, value):
+        if value <= cls.MIN:
+            return 0
+        return int(math.log(value / cls.MIN) / cls._LOG_GROWTH) + 1
+
+    @classmethod
+    def value(cls, index):
+        """Punto medio (geométrico) de la cubeta"""
+        if index == 0:
+            return cls.MIN
+        return cls.MIN * cls.GROWTH ** (index - 0.5)
+
+    @classmethod
+    def percentiles(cls, histogram):
+        total = sum(histogram.values())
+        if not total:
+            return {name: None for name, _ in cls.PERCENTILES}
+        result = {}
+        ordered = sorted(histogram.items())
+        pending = list(cls.PERCENTILES)
+        seen = 0
+        for index, count in ordered:
+            seen += count
+            while pending and seen >= pending[0][1] * total:
+                result[pending.pop(0)[0]] = round(cls.value(index), 4)
+            if not pending:
+                break
+        return result
+
+
+class SecondBuckets:
+    """Anillo de cubetas de un segundo"""
+
+    def __init__(self, seconds=300):
+        self.size = seconds
+        self.stamps = [-1] * seconds          # segundo (epoch) al que pertenece cada cubeta
+        self.counts = [0] * seconds
+        self.status = [[0] * 5 for _ in range(seconds)]  # 1xx, 2xx, 3xx, 4xx, 5xx
+        self.latency_sum = [0.0] * seconds
+        self.latency_count = [0] * seconds
+        self.latency_max = [0.0] * seconds
+        self.latency_hist = [None] * seconds   # {índice de LatencyHistogram: conteo}
+        self.connect_sum = [0.0] * seconds
+        self.connect_count = [0] * seconds
+
+    def _slot(self, second):
+        i = second % self.size
+        if self.stamps[i] != second:
+            # La cubeta tenía datos de hace una vuelta completa: se limpia
+            self.stamps[i] = second
+            self.counts[i] = 0
+            self.status[i] = [0] * 5
+            self.latency_sum[i] = 0.0
+            self.latency_count[i] = 0
+            self.latency_max[i] = 0.0
+            self.latency_hist[i] = None
+            self.connect_sum[i] = 0.0
+            self.connect_count[i] = 0
+        return i
+
+    def add(self, second, status, latency=None, connect=None):
+        i = self._slot(second)
+        self.counts[i] += 1
+        klass = status // 100 - 1
+        if 0 <= klass < 5:
+            self.status[i][klass] += 1
+        if latency is not None:
+            self.latency_sum[i] += latency
+            self.latency_count[i] += 1
+            if latency > self.latency_max[i]:
+                self.latency_max[i] = latency
+            histogram = self.latency_hist[i]
+            if histogram is None:
+                histogram = self.latency_hist[i] = {}
+            index = LatencyHistogram.index(latency)
+            histogram[index] = histogram.get(index, 0) + 1
+        if connect is not None:
+            self.connect_sum[i] += connect
+            self.connect_count[i] += 1
+
+    def _seconds(self, now, window):
+        """Índices de las cubetas de los últimos "window" segundos completos (sin el segundo en curso)"""
+        for second in range(now - window, now):
+            i = second % self.size
+            if self.stamps[i] == second:
+                yield i
+
+    def summary(self, now, window):
+        count = 0
+        status = [0] * 5
+        latency_sum = 0.0
+        latency_count = 0
+        latency_max = 0.0
+        histogram = {}
+        connect_sum = 0.0
+        connect_count = 0
+        for i in self._seconds(now, window):
+            count += self.counts[i]
+            for k in range(5):
+                status[k] += self.status[i][k]
+            latency_sum += self.latency_sum[i]
+            latency_count += self.latency_count[i]
+            latency_max = max(latency_max, self.latency_max[i])
+            if self.latency_hist[i]:
+                for index, n in self.latency_hist[i].items():
+                    histogram[index] = histogram.get(index, 0) + n
+            connect_sum += self.connect_sum[i]
+            connect_count += self.connect_count[i]
+        result = {
+            'requests': count,
+            'rps': round(count / window, 2),
+            'status': {f'{k + 1}xx': status[k] for k in range(5) if status[k]},
+            'error_rate': round(status[4] / count, 4) if count else 0.0,
+            'latency_avg': round(latency_sum / latency_count, 4) if latency_count else None,
+            'latency_max': round(latency_max, 4) if latency_count else None,
+            'connect_avg': round(connect_sum / connect_count, 4) if connect_count else None,
+        }
+        result.update(LatencyHistogram.percentiles(histogram))
+        return result
+
+    def series(self, now, window):
+        """Peticiones por segundo de los últimos "window" segundos completos (0 si no hubo)"""
+        result = []
+        for second in range(now - window, now):
+            i = second % self.size
+            result.append(self.counts[i] if self.stamps[i] == second else 0)
+        return result
+
+
+class MetricsStore:
+    """Cubetas por upstream más un agregado "total" """
+
+    TOTAL = 'total'
+
+    def __init__(self, seconds=max(WINDOWS.values())):
+        self.seconds = seconds
+        self.upstreams = {self.TOTAL: SecondBuckets(seconds)}
+
+    def record(self, server_name, status, latency=None, connect=None, now=None):
+        """Un intento contra un upstream (latencia = $upstream_response_time)"""
+        second = int(now if now is not None else time.time())
+        buckets = self.upstreams.get(server_name)
+        if buckets is None:
+            buckets = self.upstreams[server_name] = SecondBuckets(self.seconds)
+        buckets.add(second, status, latency, connect)
+
+    def record_request(self, status, latency=None, now=None):
+        """Una petición completa vista por el cliente (latencia = $request_time), en el total"""
+        second = int(now if now is not None else time.time())
+        self.upstreams[self.TOTAL].add(second, status, latency)
+
+    def summary(self, now=None):
+        """{servidor: {ventana: resumen}} para todas las ventanas"""
+        now = int(now if now is not None else time.time())
+        return {
+            name: {label: buckets.summary(now, window) for label, window in WINDOWS.items()}
+            for name, buckets in self.upstreams.items()
+        }
+
+    def series(self, window=60, now=None):
+        """{servidor: [peticiones por segundo]} del último minuto (para graficar)"""
+        now = int(now if now is not None else time.time())
+        return {name: buckets.series(now, window) for name, buckets in self.upstreams.items()}
@@ -1,17 +1,19 @@
 #!/usr/bin/env python3
 """
 Dashboard de monitoreo para SIGLAB - Servidor WebSocket
-Monitorea las peticiones al endpoint /api/maquinas/agregar
+Monitorea las peticiones a las rutas /api/* balanceadas por nginx
 """
 
 import asyncio
-import json
-import re
+import os
 import time
-from pathlib import Path
+from collections import deque
 from aiohttp import web, WSMsgType
-import aiofiles
 import logging
+from log_tailer import LogTailer, LogParser, UpstreamError
+from broadcaster import Broadcaster
+from metrics_store import MetricsStore
+from health_prober import HealthProber
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO)
@@ -25,11 +27,18 @@ class DashboardServer:
         self.active_servers = set()
         self.dead_servers = set()
         self.current_algorithm = "unknown"  # Se detectará automáticamente
-        self.request_sequence = []  # Para seguir el orden de peticiones
+        self.request_sequence = deque(maxlen=50)  # Últimas peticiones, para detectar el algoritmo
+        self.metrics = MetricsStore()  # Peticiones, estados y latencia por ventanas de tiempo
+        self.route_stats = {}  # "MÉTODO /ruta" -> {'total', 'errors'}
+        self.log_path = os.getenv('BALANCEO_LOG', '/var/log/nginx/balanceo_siglab.log')
+        self.parser = LogParser()
         self.server_status = {}  # Nuevo: track status de cada servidor
         self.last_seen = {}  # Nuevo: track última vez visto de cada servidor
         self.app = web.Application()
-        self.websockets = set()
+        self.broadcaster = Broadcaster(self.snapshot, self.total_requests)
+        # Verificación activa de /health (HEALTH_CHECKS=0 vuelve a deducir la salud solo del log)
+        self.prober = HealthProber(self.probe_failed, self.probe_recovered, lambda: list(self.server_mapping)) \
+            if HealthProber.enabled() else None
         self.setup_routes()
         
     def setup_routes(self):
@@ -47,8 +56,8 @@ class DashboardServer:
         ws = web.WebSocketResponse()
         await ws.prepare(request)
         
-        self.websockets.add(ws)
-        logger.info(f"Nuevo cliente conectado. Total: {len(self.websockets)}")
+        await self.broadcaster.register(ws)
+        logger.info(f"Nuevo cliente conectado. Total: {len(self.broadcaster.clients)}")
         
         try:
             async for msg in ws:
@@ -60,139 +69,163 @@ class DashboardServer:
         except Exception as e:
             logger.error(f"Error en WebSocket: {e}")
         finally:
-            self.websockets.discard(ws)
-            logger.info(f"Cliente desconectado. Total: {len(self.websockets)}")
+            await self.broadcaster.unregister(ws)
+            logger.info(f"Cliente desconectado. Total: {len(self.broadcaster.clients)}")
             
         return ws
         
-    async def broadcast(self, data):
-        """Enviar datos a todos los clientes WebSocket conectados"""
-        if not self.websockets:
-            return
-            
-        message = json.dumps(data)
-        disconnected = set()
-        
-        for ws in self.websockets:
-            try:
-                await ws.send_str(message)
-            except Exception as e:
-                logger.error(f"Error enviando a cliente: {e}")
-                disconnected.add(ws)
-                
-        # Limpiar conexiones rotas
-        self.websockets -= disconnected
-        
+    def snapshot(self):
+        """Estado completo que recibe un cliente al conectarse (o si se atrasó)"""
+        return {
+            'stats': self.stats.copy(),
+            'health': {name: self.server_status.get(name, "alive") for name in self.stats},
+            'routes': self.route_stats,
+            'total_requests': self.total_requests(),
+            'windows': {'summary': self.metrics.summary(), 'series': self.metrics.series(), 'probes': self.probes()}
+        }
+
+    def probes(self):
+        """Resultado de la última verificación activa de cada servidor"""
+        if self.prober is None:
+            return {}
+        return {self.server_name_for(address): probe for address, probe in self.prober.summary().items()}
+
+    def total_requests(self):
+        return sum(self.stats.values())
+
     async def watch_log_file(self):
-        """Monitorear archivo de log en tiempo real"""
-        log_path = '/var/log/nginx/balanceo_siglab.log'
-        
-        # Esperar a que el archivo exista
-        while not Path(log_path).exists():
-            logger.info(f"Esperando archivo de log: {log_path}")
-            await asyncio.sleep(2)
-            
-        logger.info(f"Monitoreando log: {log_path}")
-        
-        # Patrón regex para extraer información del log (peticiones y errores)
-        log_pattern = r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d+) - - \[.*?\] "POST /api/maquinas/agregar HTTP/1\.\d" (\d{3})'
-        error_pattern = r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d+).*?(failed|timeout|connection refused|upstream timed out)'
-        
+        """Monitorear archivo de log en tiempo real (inotify + lectura por bloques)"""
         while True:
             try:
-                async with aiofiles.open(log_path, 'r') as f:
-                    # Ir al final del archivo
-                    await f.seek(0, 2)
-                    
-                    while True:
-                        line = await f.readline()
-                        if not line:
-                            await asyncio.sleep(0.1)
+                tailer = LogTailer(self.log_path)
+                async for lines in tailer.lines():
+                    for line in lines:
+                        entry = self.parser.parse(line)
+                        if entry is None:
                             continue
-                            
-                        # Procesar línea del log
-                        line = line.strip()
-                        match = re.search(log_pattern, line)
-                        error_match = re.search(error_pattern, line, re.IGNORECASE)
-                        
-                        # Detectar errores de conexión inmediatos
-                        if error_match:
-                            upstream_addr = error_match.group(1)
-                            if upstream_addr in self.server_mapping:
-                                server_name = self.server_mapping[upstream_addr]
-                                if server_name not in self.dead_servers:
-                                    self.dead_servers.add(server_name)
-                                    self.server_status[server_name] = "dead"
-                                    logger.info(f"Servidor caído detectado INMEDIATAMENTE: {server_name} ({upstream_addr})")
-                                    
-                                    # Enviar actualización de estado inmediata
-                                    data = {
-                                        'server_ip': upstream_addr,
-                                        'server_name': server_name,
-                                        'status': 000,
-                                        'server_health': 'dead',
-                                        'timestamp': time.time(),
-                                        'stats': self.stats.copy(),
-                                        'total_requests': sum(self.stats.values()),
-                                        'server_died': True
-                                    }
-                                    await self.broadcast(data)
-                        
-                        # Procesar peticiones normales
-                        elif match:
-                            groups = match.groups()
-                            
-                            # Extraer IP y status (solo peticiones normales)
-                            upstream_addr = groups[0]
-                            status = groups[1]
-                            
-                            # Mapeo dinámico por IP: si no existe, crear nuevo servidor
-                            if upstream_addr not in self.server_mapping:
-                                server_name = f"Server_{len(self.server_mapping) + 1}"
-                                self.server_mapping[upstream_addr] = server_name
-                                self.stats[server_name] = 0
-                                self.server_status[server_name] = "alive"  # Nuevo: inicializar status
-                                logger.info(f"Nuevo servidor detectado: {upstream_addr} -> {server_name}")
-                            else:
-                                server_name = self.server_mapping[upstream_addr]
-                            
-                            # Actualizar última vez visto
-                            self.last_seen[upstream_addr] = time.time()
-                            
-                            # Actualizar estadísticas solo si es status 200
-                            if int(status) == 200:
-                                self.stats[server_name] += 1
-                                # Registrar secuencia para detectar algoritmo
-                                self.request_sequence.append(server_name)
-                                # Marcar como vivo si estaba muerto
-                                if server_name in self.dead_servers:
-                                    self.dead_servers.remove(server_name)
-                                    self.server_status[server_name] = "alive"
-                                    logger.info(f"Servidor revivido: {server_name}")
-                            
-                            # Actualizar tiempo de última actividad
-                            self.last_data_time = time.time()
-                            
-                            # Enviar datos a clientes con status del servidor
-                            data = {
-                                'server_ip': upstream_addr,
-                                'server_name': server_name,
-                                'status': int(status),
-                                'server_health': self.server_status.get(server_name, "alive"),
-                                'timestamp': time.time(),
-                                'stats': self.stats.copy(),
-                                'total_requests': sum(self.stats.values())
-                            }
-                            
-                            await self.broadcast(data)
-                            logger.info(f"Petición detectada: {server_name} ({upstream_addr}) - Status: {status}")
-                            
+                        if isinstance(entry, UpstreamError):
+                            self.handle_upstream_error(entry)
+                        else:
+                            self.handle_access(entry)
             except Exception as e:
                 logger.error(f"Error leyendo log: {e}")
                 await asyncio.sleep(5)
-    
+
+    def server_name_for(self, upstream_addr):
+        """Nombre del servidor para una dirección upstream (se asigna al verla por primera vez)"""
+        server_name = self.server_mapping.get(upstream_addr)
+        if server_name is None:
+            server_name = f"Server_{len(self.server_mapping) + 1}"
+            self.server_mapping[upstream_addr] = server_name
+            self.stats[server_name] = 0
+            self.server_status[server_name] = "alive"
+            logger.info(f"Nuevo servidor detectado: {upstream_addr} -> {server_name}")
+        # reset_checker quita de stats a los servidores sin peticiones: vuelven a contar desde cero
+        self.stats.setdefault(server_name, 0)
+        return server_name
+
+    def handle_upstream_error(self, entry):
+        """Detectar errores de conexión inmediatos"""
+        upstream_addr = entry.upstream
+        if upstream_addr not in self.server_mapping:
+            return
+        server_name = self.server_mapping[upstream_addr]
+        if server_name in self.dead_servers:
+            return
+        logger.info(f"Servidor caído detectado INMEDIATAMENTE: {server_name} ({upstream_addr}) - {entry.reason}")
+        self.mark_dead(upstream_addr, server_name)
+        if self.prober is not None:
+            # Vuelve a marcarse vivo solo tras HEALTH_SUCCESSES verificaciones correctas
+            self.prober.mark_failed(upstream_addr)
+
+    def mark_dead(self, upstream_addr, server_name):
+        """Marca un servidor como caído y lo avisa en el próximo cuadro"""
+        self.dead_servers.add(server_name)
+        self.server_status[server_name] = "dead"
+        self.broadcaster.server_changed(server_name, self.stats.setdefault(server_name, 0), "dead")
+        self.broadcaster.event('server_died', server_name=server_name, server_ip=upstream_addr)
+
+    def mark_alive(self, upstream_addr, server_name):
+        """Marca un servidor caído como vivo y lo avisa en el próximo cuadro"""
+        self.dead_servers.discard(server_name)
+        self.server_status[server_name] = "alive"
+        self.broadcaster.server_changed(server_name, self.stats.setdefault(server_name, 0), "alive")
+        self.broadcaster.event('server_revived', server_name=server_name, server_ip=upstream_addr)
+        logger.info(f"Servidor revivido: {server_name}")
+
+    def probe_failed(self, upstream_addr):
+        """La verificación activa falló HEALTH_FAILURES veces seguidas"""
+        server_name = self.server_name_for(upstream_addr)
+        if server_name not in self.dead_servers:
+            logger.info(f"Servidor caído detectado por verificación activa: {server_name} ({upstream_addr})")
+            self.mark_dead(upstream_addr, server_name)
+
+    def probe_recovered(self, upstream_addr):
+        """La verificación activa respondió HEALTH_SUCCESSES veces seguidas (o es la primera vez)"""
+        server_name = self.server_name_for(upstream_addr)
+        if server_name in self.dead_servers:
+            self.mark_alive(upstream_addr, server_name)
+        else:
+            # Servidor nuevo detectado por la verificación, antes de recibir tráfico
+            self.broadcaster.server_changed(server_name, self.stats[server_name], "alive")
+
+    def handle_access(self, entry):
+        """Procesar una petición atendida por algún upstream"""
+        # Actualizar tiempo de última actividad
+        self.last_data_time = time.time()
+
+        # Conteo por ruta (incluye las respuestas servidas desde la caché de nginx)
+        route_key = f"{entry.method} {entry.route}"
+        route = self.route_stats.get(route_key)
+        if route is None:
+            route = self.route_stats[route_key] = {'total': 0, 'errors': 0}
+        route['total'] += 1
+        if entry.status >= 500:
+            route['errors'] += 1
+        self.broadcaster.route_changed(route_key, route)
+        self.broadcaster.request(entry.status)
+        # Total: latencia vista por el cliente ($request_time)
+        self.metrics.record_request(entry.status, entry.request_time, now=self.last_data_time)
+
+        # Cada intento cuenta para su servidor, también los fallidos que nginx reintentó en otro
+        # (el parser solo deja intentos con dirección host:puerto)
+        for attempt in entry.attempts:
+            self.metrics.record(
+                self.server_name_for(attempt.upstream), attempt.status or 0,
+                attempt.response_time, attempt.connect_time, now=self.last_data_time
+            )
+
+        # Sin servidor que respondiera: respuesta de caché, error generado por el propio nginx
+        # o grupo sin servidores vivos (el parser deja "-" en lugar del nombre del grupo)
+        upstream_addr = entry.upstream
+        if not LogParser.is_address(upstream_addr):
+            return
+
+        server_name = self.server_name_for(upstream_addr)
+        # Actualizar última vez visto
+        self.last_seen[upstream_addr] = self.last_data_time
+        if not entry.attempts:
+            # Log con el formato anterior (sin tiempos)
+            self.metrics.record(server_name, entry.status, now=self.last_data_time)
+
+        # Actualizar estadísticas solo si la petición fue exitosa (2xx o 304 de revalidación)
+        if 200 <= entry.status < 400:
+            self.stats[server_name] += 1
+            # Registrar secuencia para detectar algoritmo
+            self.request_sequence.append(server_name)
+            # Marcar como vivo si estaba muerto
+            if server_name in self.dead_servers:
+                self.mark_alive(upstream_addr, server_name)
+
+        # Se envía en el próximo cuadro (solo el servidor que cambió)
+        self.broadcaster.server_changed(server_name, self.stats[server_name], self.server_status.get(server_name, "alive"))
+        # Formato diferido: con decenas de miles de líneas por segundo no se arma el texto si no se usa
+        logger.debug("Petición detectada: %s (%s) %s - Status: %s", server_name, upstream_addr, route_key, entry.status)
+
     async def monitor_server_health(self):
-        """Monitorear salud de servidores detectando cuáles no aparecen en logs"""
+        """Monitorear salud de servidores detectando cuáles no aparecen en logs
+        (solo sin verificación activa: con balanceo por hash o por pesos un servidor sano
+        puede pasar más de 10 segundos sin tráfico)"""
         while True:
             await asyncio.sleep(5)  # Revisar cada 5 segundos
             
@@ -204,22 +237,8 @@ class DashboardServer:
                 
                 if current_time - last_seen_time > 10:  # 10 segundos sin actividad
                     if server_name not in self.dead_servers:
-                        self.dead_servers.add(server_name)
-                        self.server_status[server_name] = "dead"
                         logger.info(f"Servidor caído detectado: {server_name} ({upstream_addr})")
-                        
-                        # Enviar actualización de estado
-                        data = {
-                            'server_ip': upstream_addr,
-                            'server_name': server_name,
-                            'status': 000,
-                            'server_health': 'dead',
-                            'timestamp': current_time,
-                            'stats': self.stats.copy(),
-                            'total_requests': sum(self.stats.values()),
-                            'server_died': True
-                        }
-                        await self.broadcast(data)
+                        self.mark_dead(upstream_addr, server_name)
     
     def redistribuir_segun_algoritmo(self, servidor_caído, peticiones_a_redistribuir, servidores_activos):
         
@@ -253,7 +272,7 @@ class DashboardServer:
             return {"tipo": "desconocido", "pesos": {}}
         
         # Analizar últimas 20 peticiones o todas si hay menos
-        ultimas_peticiones = self.request_sequence[-20:]
+        ultimas_peticiones = list(self.request_sequence)[-20:]
         
         # Contar frecuencia de cada servidor
         frecuencia = {}
@@ -321,7 +340,7 @@ class DashboardServer:
         if servidores_activos:
             # Encontrar el servidor que más recibe peticiones (simulando el hash)
             frecuencias = {}
-            for servidor in self.request_sequence[-50:]:  # Últimas 50 peticiones
+            for servidor in self.request_sequence:  # Últimas 50 peticiones
                 if servidor in servidores_activos:
                     frecuencias[servidor] = frecuencias.get(servidor, 0) + 1
             
@@ -370,8 +389,17 @@ class DashboardServer:
                 self.stats[servidor] += extra
     
                     
+    async def publish_windows(self):
+        """Enviar cada segundo el resumen por ventanas y las peticiones del último segundo"""
+        while True:
+            await asyncio.sleep(1)
+            now = int(time.time())
+            last_second = {name: counts[-1] for name, counts in self.metrics.series(1, now).items()}
+            self.broadcaster.windows(self.metrics.summary(now), last_second, self.probes())
+
     async def reset_checker(self):
-        """Verificar si hay que resetear estadísticas por inactividad"""
+        """Verificar si hay que resetear estadísticas por inactividad
+        (solo los contadores acumulados; las ventanas de tiempo se conservan)"""
         while True:
             await asyncio.sleep(1)
             
@@ -381,19 +409,21 @@ class DashboardServer:
                     # Limpiar servidores que no tienen estadísticas
                     active_servers = {k: v for k, v in self.stats.items() if v > 0}
                     self.stats = {k: 0 for k in active_servers}
+                    self.route_stats = {}
                     
-                    await self.broadcast({
-                        'reset': True,
-                        'stats': self.stats.copy(),
-                        'total_requests': 0
-                    })
+                    self.broadcaster.reset()
                     logger.info("Estadísticas reseteadas por inactividad")
                     
     async def start_background_tasks(self):
         """Iniciar tareas en segundo plano"""
         asyncio.create_task(self.watch_log_file())
         asyncio.create_task(self.reset_checker())
-        asyncio.create_task(self.monitor_server_health())
+        if self.prober is not None:
+            asyncio.create_task(self.prober.run())
+        else:
+            asyncio.create_task(self.monitor_server_health())
+        asyncio.create_task(self.broadcaster.run())
+        asyncio.create_task(self.publish_windows())
         
     async def start(self):
         """Iniciar servidor"""
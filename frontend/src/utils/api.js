@@ -83,9 +83,10 @@ export const api = {
   },
 
   informeGeneral: async (codigo = null) => {
+    // El reporte muestra cada mantenimiento, así que se piden las listas completas
     const url = codigo 
-      ? `${API_BASE_URL}/mantenimiento/informe-general?codigo=${codigo}`
-      : `${API_BASE_URL}/mantenimiento/informe-general`;
+      ? `${API_BASE_URL}/mantenimiento/informe-general?codigo=${codigo}&incluir_mantenimientos=true`
+      : `${API_BASE_URL}/mantenimiento/informe-general?incluir_mantenimientos=true`;
     const response = await fetch(url);
     
     if (!response.ok) {